@@ -1,16 +1,123 @@
 import argparse
+import concurrent.futures
+import ip_counters
+import os
 import re
+import sys
+import time
 
-parser = argparse.ArgumentParser(description='Finds 10 most commonipaddresses in log')
-parser.add_argument("log_name", help="Path to the log file")
-args = parser.parse_args()
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+import logscan
 
-ips = {}
-with open(args.log_name) as file:
-    pattern = r"^[0-9]{1,3}\.[0-9]{1,3}\.[0-9]{1,3}\.[0-9]{1,3}"
-    for line in file: 
-        for ip in re.findall(pattern, line):
-            ips[ip] = ips.get(ip, 0) + 1
+IP_PATTERN = re.compile(rb"[0-9]{1,3}\.[0-9]{1,3}\.[0-9]{1,3}\.[0-9]{1,3}")
 
-for top_ip in sorted(ips, key=ips.get, reverse=True)[:10]:
-    print(top_ip, ips[top_ip])
+
+def new_counter(mode, capacity):
+    if mode == "approx":
+        return ip_counters.SpaceSavingCounter(capacity)
+    return ip_counters.ExactCounter()
+
+
+def count_file(path, mode, capacity):
+    """
+    Count IP addresses of `path` log, plain or compressed.
+    """
+    ips = new_counter(mode, capacity)
+    for found_ips in logscan.findall_file(path, IP_PATTERN, anchored=True):
+        ips.update(found_ips)
+    return ips
+
+
+def count_files(paths, mode, capacity):
+    """
+    Count IP addresses of all `paths` logs, several files are decompressed and parsed at the same time by a pool of processes.
+    """
+    ips = new_counter(mode, capacity)
+    if len(paths) == 1 or os.cpu_count() == 1:
+        for path in paths:
+            ips.merge(count_file(path, mode, capacity))
+        return ips
+
+    with concurrent.futures.ProcessPoolExecutor(min(os.cpu_count(), len(paths))) as executor:
+        futures = [executor.submit(count_file, path, mode, capacity) for path in paths]
+        # merged in the files order, so equal counts are printed in the same order as in a single process
+        for future in futures:
+            ips.merge(future.result())
+    return ips
+
+
+def count_new_ips(path, checkpoint, ips, mode, capacity):
+    """
+    Count IP addresses of complete lines appended to plain `path` log since `checkpoint` position,
+    return `ips` counter updated with them.
+    """
+    offset = checkpoint.resume(path)
+    if offset == 0:
+        ips = new_counter(mode, capacity)
+    with logscan.mapped(path) as buffer:
+        end = logscan.complete_end(buffer, offset)
+        for found_ips in logscan.findall(buffer, IP_PATTERN, offset, end, anchored=True):
+            ips.update(found_ips)
+    checkpoint.update(path, end, ips.state() if checkpoint.path else None)
+    return ips
+
+
+def print_top(ips, top, mode):
+    for top_ip, count, error in ips.top(top):
+        if mode == "approx":
+            print(top_ip, count, f"(at least {count - error})")
+        else:
+            print(top_ip, count)
+    if mode == "approx":
+        print(f"Counts are overestimated by at most {ips.error_bound} of {ips.total} total")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Finds 10 most commonipaddresses in log')
+    parser.add_argument(
+        "log_name", nargs="+",
+        help="Path to the log file, globs and gzip/bz2/xz/zstd compressed logs are accepted"
+    )
+    parser.add_argument("--top", type=int, default=10, help="Number of IP addresses to print")
+    parser.add_argument(
+        "--mode", choices=sorted(ip_counters.COUNTERS), default="exact",
+        help="exact counts of all addresses, or approximate counts within fixed memory"
+    )
+    parser.add_argument("--capacity", type=int, default=10000, help="Number of addresses kept in approx mode")
+    parser.add_argument(
+        "--checkpoint",
+        help="Checkpoint file, the log is parsed only from the position saved there and counts are added to saved ones"
+    )
+    parser.add_argument("--follow", action="store_true", help="Keep parsing lines appended to the log, print top periodically")
+    parser.add_argument("--interval", type=float, default=logscan.FOLLOW_INTERVAL, help="Seconds between --follow updates")
+    args = parser.parse_args()
+
+    paths = logscan.expand(args.log_name)
+    if not (args.checkpoint or args.follow):
+        print_top(count_files(paths, args.mode, args.capacity), args.top, args.mode)
+        return
+
+    if len(paths) != 1 or logscan.codec(paths[0]) is not None:
+        parser.error("--checkpoint and --follow work with a single plain log only")
+    checkpoint = logscan.Checkpoint(args.checkpoint)
+    if checkpoint.state is not None and checkpoint.state["mode"] != args.mode:
+        parser.error(f"{args.checkpoint} keeps {checkpoint.state['mode']} counts, can not continue them in {args.mode} mode")
+    ips = ip_counters.from_state(checkpoint.state) if checkpoint.state else new_counter(args.mode, args.capacity)
+
+    if not args.follow:
+        ips = count_new_ips(paths[0], checkpoint, ips, args.mode, args.capacity)
+        print_top(ips, args.top, args.mode)
+        return
+
+    def step():
+        nonlocal ips
+        ips = count_new_ips(paths[0], checkpoint, ips, args.mode, args.capacity)
+        print(f"--- {time.strftime('%H:%M:%S')}, {ips.total} requests ---")
+        print_top(ips, args.top, args.mode)
+        sys.stdout.flush()
+
+    logscan.follow(step, args.interval)
+
+
+if __name__ == '__main__':
+    main()
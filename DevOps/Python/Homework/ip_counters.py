@@ -0,0 +1,184 @@
+import collections
+import heapq
+import operator
+
+
+def pack_ip(ip):
+    """
+    Pack canonical dotted IPv4 address (bytes) to 32-bit int. Anything else (octets out of range,
+    leading zeros) is returned as is, so different spellings are never merged.
+    """
+    try:
+        octets = [int(octet) for octet in ip.split(b".")]
+    except ValueError:
+        return ip
+    if len(octets) != 4 or b"%d.%d.%d.%d" % tuple(octets) != ip or max(octets) > 255:
+        return ip
+    return octets[0] << 24 | octets[1] << 16 | octets[2] << 8 | octets[3]
+
+
+def unpack_ip(key):
+    if isinstance(key, bytes):
+        return key.decode()
+    return f"{key >> 24}.{key >> 16 & 255}.{key >> 8 & 255}.{key & 255}"
+
+
+class ExactCounter(object):
+    """
+    Exact counts of all the IP addresses, kept in a dict keyed by packed IPv4 addresses.
+    """
+    def __init__(self):
+        self.counts = {}
+        self.total = 0
+
+    def update(self, ips):
+        # duplicates are folded by C-level counting first, so packing is done once per distinct IP
+        for ip, count in collections.Counter(ips).items():
+            key = pack_ip(ip)
+            self.counts[key] = self.counts.get(key, 0) + count
+            self.total += count
+
+    def merge(self, other):
+        for key, count in other.counts.items():
+            self.counts[key] = self.counts.get(key, 0) + count
+        self.total += other.total
+        return self
+
+    def top(self, k):
+        """
+        Return up to `k` (ip, count, error) tuples with the highest counts, error is always 0.
+        """
+        return [
+            (unpack_ip(key), count, 0)
+            for key, count in heapq.nlargest(k, self.counts.items(), key=operator.itemgetter(1))
+        ]
+
+    @property
+    def error_bound(self):
+        return 0
+
+    def state(self):
+        """
+        Return JSON-serializable counts, `from_state()` restores the counter from them.
+        """
+        return {"mode": "exact", "total": self.total, "counts": {unpack_ip(key): count for key, count in self.counts.items()}}
+
+    @classmethod
+    def from_state(cls, state):
+        counter = cls()
+        counter.total = state["total"]
+        counter.counts = {pack_ip(ip.encode()): count for ip, count in state["counts"].items()}
+        return counter
+
+
+class SpaceSavingCounter(object):
+    """
+    Approximate counter which keeps at most `capacity` IP addresses (Space-Saving algorithm).
+    When a new address comes to the full table, the address with the minimal count is replaced and
+    the new one inherits that count as its error. So every reported count overestimates the real one
+    by at most its error, and every address seen more than `error_bound` times is in the table.
+    """
+    def __init__(self, capacity=10000):
+        self.capacity = capacity
+        # key -> [count, error]
+        self.counts = {}
+        # (count, key is bytes, key) min-heap, entries are refreshed lazily when counts grow,
+        # the flag keeps int and bytes keys of equal counts from being compared
+        self.heap = []
+        self.total = 0
+
+    def _evict(self):
+        while True:
+            count, _, key = heapq.heappop(self.heap)
+            if self.counts[key][0] == count:
+                return key, count
+            # stale entry, the count has grown since it was pushed
+            heapq.heappush(self.heap, (self.counts[key][0], isinstance(key, bytes), key))
+
+    def update(self, ips):
+        for ip, count in collections.Counter(ips).items():
+            key = pack_ip(ip)
+            self.total += count
+            entry = self.counts.get(key)
+            if entry is not None:
+                entry[0] += count
+                continue
+            error = 0
+            if len(self.counts) >= self.capacity:
+                evicted, error = self._evict()
+                del self.counts[evicted]
+            self.counts[key] = [error + count, error]
+            heapq.heappush(self.heap, (error + count, isinstance(key, bytes), key))
+
+    def _min_count(self):
+        # any address missing from the full table could have been counted up to the minimal count
+        if len(self.counts) < self.capacity:
+            return 0
+        return min(count for count, error in self.counts.values())
+
+    def merge(self, other):
+        """
+        Add counts of `other` counter (of parts of the log parsed separately) keeping `capacity` addresses.
+        Address missing from one of the tables gets its minimal count as both count and error, so the bounds hold.
+        """
+        self_min, other_min = self._min_count(), other._min_count()
+        merged = {}
+        for key in list(self.counts) + [key for key in other.counts if key not in self.counts]:
+            count, error = self.counts.get(key, (self_min, self_min))
+            other_count, other_error = other.counts.get(key, (other_min, other_min))
+            merged[key] = [count + other_count, error + other_error]
+        self.counts = dict(heapq.nlargest(self.capacity, merged.items(), key=lambda item: item[1][0]))
+        self.heap = [(count, isinstance(key, bytes), key) for key, (count, error) in self.counts.items()]
+        heapq.heapify(self.heap)
+        self.total += other.total
+        return self
+
+    def top(self, k):
+        """
+        Return up to `k` (ip, count, error) tuples with the highest counts,
+        the real count of each address is in [count - error, count] range.
+        """
+        return [
+            (unpack_ip(key), count, error)
+            for key, (count, error) in heapq.nlargest(k, self.counts.items(), key=lambda item: item[1][0])
+        ]
+
+    @property
+    def error_bound(self):
+        """
+        Upper bound of any count error.
+        """
+        return max(self.total // self.capacity, self._min_count())
+
+    def state(self):
+        """
+        Return JSON-serializable counts, `from_state()` restores the counter from them.
+        """
+        return {
+            "mode": "approx",
+            "capacity": self.capacity,
+            "total": self.total,
+            "counts": {unpack_ip(key): entry for key, entry in self.counts.items()},
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        counter = cls(state["capacity"])
+        counter.total = state["total"]
+        counter.counts = {pack_ip(ip.encode()): entry for ip, entry in state["counts"].items()}
+        counter.heap = [(count, isinstance(key, bytes), key) for key, (count, error) in counter.counts.items()]
+        heapq.heapify(counter.heap)
+        return counter
+
+
+COUNTERS = {
+    "exact": ExactCounter,
+    "approx": SpaceSavingCounter,
+}
+
+
+def from_state(state):
+    """
+    Restore counter of any mode from its `state()`.
+    """
+    return COUNTERS[state["mode"]].from_state(state)
@@ -0,0 +1,111 @@
+import base64
+import csv
+import gzip
+import hashlib
+import io
+import os
+import random
+
+
+from flask import Flask, Response, request
+
+
+"""
+Local stand-in for the workshop API server. It serves generated data, so it validates the format of
+submitted values rather than their exact content unless expected values are set in environment:
+    * REPORT_ROWS - number of transactions in generated Task1 report
+    * EXPECTED_BYTES_SERVED / EXPECTED_FAILED_RATE - values accepted by Task2 checks
+    * FAILURE_RATE - share (0..1) of requests answered with 503, to exercise client retries
+    * PORT - port to listen on
+"""
+API_USERNAME = os.environ.get("API_USERNAME", "username")
+API_PASSWORD = os.environ.get("API_PASSWORD", "password")
+REPORT_ROWS = int(os.environ.get("REPORT_ROWS", 100))
+FAILURE_RATE = float(os.environ.get("FAILURE_RATE", 0))
+
+REPORT_HEADER = ["Transaction Name", "Minimum", "Average", "Maximum", "Std. Deviation", "90 Percent", "Pass", "Fail", "Stop"]
+
+app = Flask(__name__)
+
+
+def generate_report(rows, seed=0):
+    rnd = random.Random(seed)
+    percent_90_max = 0
+    fail_rate_max = 0
+    with io.StringIO() as csv_handler:
+        writer = csv.writer(csv_handler, lineterminator="\n")
+        writer.writerow(REPORT_HEADER)
+        for row in range(rows):
+            average = round(rnd.uniform(0.001, 5), 3)
+            percent_90 = round(average * 2, 3)
+            passed, failed = rnd.randint(1, 10000), rnd.randint(0, 100)
+            writer.writerow([f"Transaction_{row}", average / 2, average, average * 3, 0.5, percent_90, passed, failed, 0])
+            percent_90_max = max(percent_90_max, percent_90)
+            fail_rate_max = max(fail_rate_max, failed / passed)
+        content = csv_handler.getvalue()
+    return content, (round(percent_90_max, 2), round(fail_rate_max, 2))
+
+
+REPORT_CONTENT, REPORT_STATS = generate_report(REPORT_ROWS)
+REPORT_BODY = base64.b64encode(gzip.compress(REPORT_CONTENT.encode()))
+
+
+def authorized():
+    auth = request.authorization
+    return auth is not None and auth.username == API_USERNAME and auth.password == API_PASSWORD
+
+
+def check(passed):
+    return ("OK", 200) if passed else ("Wrong value", 400)
+
+
+@app.before_request
+def inject_failures():
+    if FAILURE_RATE and random.random() < FAILURE_RATE:
+        return "Service unavailable", 503
+
+
+@app.route("/task1/report_get")
+def report_get():
+    if not authorized():
+        return "Unauthorized", 401
+    return Response(REPORT_BODY, headers={"checksum": hashlib.md5(REPORT_BODY).hexdigest()})
+
+
+@app.route("/task1/report_post", methods=["POST"])
+def report_post():
+    if not authorized():
+        return "Unauthorized", 401
+    try:
+        content = gzip.decompress(base64.b64decode(request.get_data())).decode()
+        rows = list(csv.DictReader(io.StringIO(content)))
+        values = tuple(float(row["Value"]) for row in rows)
+    except Exception:
+        return "Malformed report", 400
+    return check(values == REPORT_STATS)
+
+
+@app.route("/task3/test", methods=["POST"])
+def test():
+    return check(request.form.get("it") == "works")
+
+
+@app.route("/task3/check_bytes_served", methods=["POST"])
+def check_bytes_served():
+    value = request.form.get("bytes_served", "")
+    expected = os.environ.get("EXPECTED_BYTES_SERVED")
+    return check(value.isdigit() and (expected is None or value == expected))
+
+
+@app.route("/task3/check_failed_rate", methods=["POST"])
+def check_failed_rate():
+    value = request.form.get("failed_rate", "")
+    expected = os.environ.get("EXPECTED_FAILED_RATE")
+    try:
+        return check(expected is None and float(value) >= 0 or value == expected)
+    except ValueError:
+        return check(False)
+
+
+if __name__ == "__main__":
+    app.run(host="0.0.0.0", port=int(os.environ.get("PORT", 5000)), threaded=True)
@@ -0,0 +1,79 @@
+import argparse
+import csv
+import io
+import logging
+import random
+import stats
+import time
+
+
+HEADER = "Transaction Name,Minimum,Average,Maximum,Std. Deviation,90 Percent,Pass,Fail,Stop\n"
+
+
+def generate_report(rows, seed=0):
+    """
+    Generate CSV report content with `rows` transactions, the same `seed` gives the same content.
+    """
+    rnd = random.Random(seed)
+    lines = [HEADER]
+    for row in range(rows):
+        average = rnd.uniform(0.001, 5)
+        lines.append(
+            f"Transaction_{row},{average / 2:.3f},{average:.3f},{average * 3:.3f},{rnd.uniform(0, 2):.3f},"
+            f"{average * 2:.3f},{rnd.randint(1, 10000)},{rnd.randint(0, 100)},0\n"
+        )
+    return "".join(lines)
+
+
+def dictreader_stats(content):
+    """
+    Reference implementation: `csv.DictReader` loop, converting cells one by one.
+    """
+    data_percent_90_value = 0
+    data_fail_rate_value = 0
+    with io.StringIO(content) as csv_handler:
+        for row in csv.DictReader(csv_handler):
+            data_percent_90_value = max(data_percent_90_value, float(row['90 Percent']))
+            data_fail_rate_value = max(data_fail_rate_value, float(row['Fail']) / float(row['Pass']))
+    return data_percent_90_value, data_fail_rate_value
+
+
+def numpy_stats(content):
+    with io.StringIO(content) as csv_handler:
+        report_stats = stats.summarize(stats.load_report(csv_handler))
+    return report_stats["percent_90_max"], report_stats["fail_rate_max"]
+
+
+def measure(function, *args, repeat=3):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function(*args)
+        timings.append(time.perf_counter() - started)
+    return result, min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare csv.DictReader loop with numpy stats engine")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    for rows in args.rows:
+        content = generate_report(rows)
+        expected, dictreader_time = measure(dictreader_stats, content, repeat=args.repeat)
+        actual, numpy_time = measure(numpy_stats, content, repeat=args.repeat)
+        assert expected == actual, f"Stats mismatch: {expected} != {actual}"
+        logging.info(
+            f"{rows:>10} rows: DictReader {dictreader_time:.3f}s, numpy {numpy_time:.3f}s, "
+            f"x{dictreader_time / numpy_time:.1f} faster"
+        )
+
+
+if __name__ == '__main__':
+    logging.basicConfig(
+        level=logging.DEBUG,
+        format='%(message)s',
+    )
+
+    main()
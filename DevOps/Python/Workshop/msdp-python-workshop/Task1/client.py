@@ -1,11 +1,17 @@
-import requests
-import requests.auth
 import base64
 import hashlib
 import csv
 import gzip
 import io
+import contextlib
 import logging
+import os
+import report
+import stats
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+import api_client
 
 
 API_URL = "http://localhost:5000"
@@ -15,6 +21,12 @@ API_PASSWORD = "password"
 REPORT_GET_ENDPOINT  = "/task1/report_get"
 REPORT_POST_ENDPOINT = "/task1/report_post"
 
+# read report incrementally instead of loading whole response content into memory
+STREAM_REPORT = True
+
+# keep-alive session with retries, shared by all the API calls
+API = api_client.ApiClient(API_URL, API_USERNAME, API_PASSWORD)
+
 
 def main():
     """
@@ -26,7 +38,7 @@ def main():
     ### Block implemented by student
     # response = "<requests.Response Object>"
 
-    response = requests.get(API_URL + REPORT_GET_ENDPOINT, auth=requests.auth.HTTPBasicAuth(API_USERNAME, API_PASSWORD))
+    response = API.get(REPORT_GET_ENDPOINT, stream=STREAM_REPORT)
 
     ### Block implemented by student
     assert response.status_code == 200, f"Wrong API response '{response.status_code} / {response.reason}', check the code again"
@@ -43,8 +55,12 @@ def main():
     # logging.info(f"content_checksum:{content_checksum}")
 
     ### Block implemented by student
-    assert content_checksum == hashlib.md5(response.content).hexdigest(), "Wrong content checksum, check the code again"
-    logging.info("Content checksum is correct")
+    if STREAM_REPORT:
+        # checksum is validated by `report.report_lines()` while the content is read
+        assert content_checksum is not None, "Content checksum is missing, check the code again"
+    else:
+        assert content_checksum == hashlib.md5(response.content).hexdigest(), "Wrong content checksum, check the code again"
+        logging.info("Content checksum is correct")
 
     """
     Step 1.3. Decode response content.
@@ -67,16 +83,21 @@ def main():
     # content_gzip_decompressed_bytes = <decompress gziped bytes to content bytes>
     # content_gzip_decompressed_str = <decode content bytes to a string>
 
-    content_base64_decoded_bytes = base64.b64decode(response.content)
-    # logging.debug(content_base64_decoded_bytes)
-    content_gzip_decompressed_bytes = gzip.decompress(content_base64_decoded_bytes)
-    # logging.debug(content_gzip_decompressed_bytes)
-    content_gzip_decompressed_str = content_gzip_decompressed_bytes.decode()
-    # logging.debug(content_gzip_decompressed_str)
-    ### Block implemented by student
+    if STREAM_REPORT:
+        # base64 decoding, decompression and text decoding are performed chunk by chunk while reading the lines
+        csv_lines = report.report_lines(response)
+    else:
+        content_base64_decoded_bytes = base64.b64decode(response.content)
+        # logging.debug(content_base64_decoded_bytes)
+        content_gzip_decompressed_bytes = gzip.decompress(content_base64_decoded_bytes)
+        # logging.debug(content_gzip_decompressed_bytes)
+        content_gzip_decompressed_str = content_gzip_decompressed_bytes.decode()
+        # logging.debug(content_gzip_decompressed_str)
+        ### Block implemented by student
 
-    assert isinstance(content_gzip_decompressed_str, str), "Wrong content type, check the code again"
-    # logging.debug(f"Response content:\n{content_gzip_decompressed_str}")
+        assert isinstance(content_gzip_decompressed_str, str), "Wrong content type, check the code again"
+        # logging.debug(f"Response content:\n{content_gzip_decompressed_str}")
+        csv_lines = io.StringIO(content_gzip_decompressed_str)
 
     """
     Step 1.4. Parse response content as CSV data, find out required stats based on parsed data.
@@ -98,45 +119,27 @@ def main():
             * `csv.DictReader` accepts string, that's why use `io.StringIO`, not `io.BytesIO`
             * all values from CSV are string, use `float()` before performing any divisions/subtractions/comparisons
     """
-    # value with the highest "90 Percent" average time
-    data_percent_90_value = 0
+    ### Block implemented by student
+    # `stats` parses CSV straight into typed numpy array and finds values with vectorized reductions,
+    # both values are computed independently from each other
+    with contextlib.closing(csv_lines) as csv_handler:
+        report_data = stats.load_report(csv_handler)
+    logging.debug(f"{len(report_data)} lines")
 
+    report_stats = stats.summarize(report_data)
+    # value with the highest "90 Percent" average time
+    data_percent_90_value = report_stats["percent_90_max"]
     # value with the highest fail rate (`Fail` / `Pass` ratio)
-    data_fail_rate_value = 0
+    data_fail_rate_value = report_stats["fail_rate_max"]
 
-    with io.StringIO(content_gzip_decompressed_str) as csv_handler:
-        pass
-        ### Block implemented by student
-        # csv_reader = <create csv dict reader from StringIO object>
-        # print column names
-
-        csv_reader = csv.DictReader(csv_handler)
-        # logging.info(csv_reader.fieldnames)
-        # for each row from csv reader
-        for indx, row in enumerate(csv_reader):
-            # logging.debug(row['90 Percent'])
-            p90 = float(row['90 Percent'])
-            if p90 > data_percent_90_value:
-                data_percent_90_value = p90
-
-                fail_rate = float(row['Fail'])
-                pass_rate = float(row['Pass'])
-                rate = fail_rate / pass_rate
-
-                if rate > data_fail_rate_value:
-                    data_fail_rate_value = rate
-
-        # logging.debug(f"{indx+1} lines")
-            # get "90 Percent" value
-            # if it is greater than current `data_percent_90_value`
-                # store new "90 Percent" value
-
-            # get ("Fail" / "Pass") value
-            # if it is greater than current `data_fail_rate_value`
-                # store new ("Fail" / "Pass") value
-
-        # print how many lines were processed from csv reader
-        ### Block implemented by student
+    logging.debug(f"90 percent median is {report_stats['percent_90_p50']}, 99th percentile is {report_stats['percent_90_p99']}")
+    logging.debug(f"Top 90 percent transactions: {report_stats['top_percent_90']}")
+    logging.debug(f"Top fail rate transactions: {report_stats['top_fail_rate']}")
+    ### Block implemented by student
+
+    if STREAM_REPORT:
+        # all the content was read at that point, so checksum has been validated
+        logging.info("Content checksum is correct")
 
     """
     Step 1.5. Round each data_*_value to 2 precision after the decimal point, using round() build-in function
@@ -205,14 +208,12 @@ def main():
     """
     ### Block implemented by student
     # response_post = "<requests.Response Object>"
-    response_post = requests.post(
-        API_URL + REPORT_POST_ENDPOINT, 
-        auth=requests.auth.HTTPBasicAuth(API_USERNAME, API_PASSWORD),
-        data=base64.b64encode(gzip.compress(content)))
+    response_post = API.post(REPORT_POST_ENDPOINT, data=base64.b64encode(gzip.compress(content)))
 
     ### Block implemented by student
     assert response_post.status_code == 200, f"Wrong API response '{response.status_code} / {response.reason}', check the code again"
     logging.info("API check passed, you are good")
+    API.log_latency()
 
 
 if __name__ == '__main__':
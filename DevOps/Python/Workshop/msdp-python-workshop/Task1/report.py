@@ -0,0 +1,85 @@
+import base64
+import codecs
+import hashlib
+import zlib
+
+
+# size of the raw (base64-encoded) blocks read from the response
+CHUNK_SIZE = 64 * 1024
+# upper bound of decompressed bytes produced from a single inflate call
+INFLATE_SIZE = 256 * 1024
+
+
+class InvalidChecksumException(Exception): pass
+
+
+def inflate(chunks):
+    """
+    Decompress gzip data coming in `chunks` (iterable of bytes) without holding more than
+    `INFLATE_SIZE` decompressed bytes at once. Concatenated gzip members are supported the same way
+    `gzip.decompress()` supports them.
+    """
+    decompressor = zlib.decompressobj(wbits=31)
+    for chunk in chunks:
+        while chunk:
+            yield decompressor.decompress(chunk, INFLATE_SIZE)
+            chunk = decompressor.unconsumed_tail
+            if decompressor.eof:
+                # next gzip member starts right after the end of the current one
+                chunk = decompressor.unused_data + chunk
+                decompressor = zlib.decompressobj(wbits=31)
+    yield decompressor.flush()
+
+
+def b64decode(chunks):
+    """
+    Decode base64 data coming in `chunks` (iterable of bytes). Chunk borders may split base64 quantum,
+    so the incomplete tail is carried over to the next chunk. Whitespaces are ignored.
+    """
+    tail = b""
+    for chunk in chunks:
+        chunk = tail + chunk.translate(None, b" \t\r\n")
+        aligned = len(chunk) - len(chunk) % 4
+        tail = chunk[aligned:]
+        yield base64.b64decode(chunk[:aligned])
+    # raises binascii.Error on truncated content
+    yield base64.b64decode(tail)
+
+
+def iter_lines(chunks, encoding="utf-8"):
+    """
+    Decode bytes coming in `chunks` to text and yield it line by line (line endings are kept,
+    as `csv` module expects). Multi-byte characters split by chunk borders are handled by incremental decoder.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)()
+    tail = ""
+    for chunk in chunks:
+        lines = (tail + decoder.decode(chunk)).split("\n")
+        tail = lines.pop()
+        for line in lines:
+            yield line + "\n"
+    tail += decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+def report_lines(response, chunk_size=CHUNK_SIZE):
+    """
+    Yield CSV report lines from streamed (`stream=True`) base64-encoded gzip-compressed `response`.
+
+    MD5 of the content is calculated while the bytes arrive and compared with the `checksum` header
+    when the content is over, `InvalidChecksumException` is raised on mismatch. Lines are yielded
+    before the whole content is validated, so results must be treated as valid only after the
+    generator is exhausted.
+    """
+    content_checksum = response.headers.get("checksum")
+    content_md5 = hashlib.md5()
+
+    def raw_chunks():
+        for chunk in response.iter_content(chunk_size):
+            content_md5.update(chunk)
+            yield chunk
+        if content_md5.hexdigest() != content_checksum:
+            raise InvalidChecksumException("Wrong content checksum, check the code again")
+
+    yield from iter_lines(inflate(b64decode(raw_chunks())))
@@ -0,0 +1,84 @@
+import numpy
+
+
+# CSV report columns used by stats calculation and corresponding field names of the parsed array
+COLUMNS = {
+    "Transaction Name": "name",
+    "90 Percent": "percent_90",
+    "Pass": "passed",
+    "Fail": "failed",
+}
+
+REPORT_DTYPE = numpy.dtype([
+    ("name", "O"),
+    ("percent_90", "f8"),
+    ("passed", "f8"),
+    ("failed", "f8"),
+])
+
+
+def load_report(lines):
+    """
+    Parse CSV report `lines` (iterable of strings, the first one is the header) straight into
+    structured numpy array with `REPORT_DTYPE` fields. Only required columns are parsed.
+    """
+    lines = iter(lines)
+    header = next(lines, "").rstrip("\r\n").split(",")
+    try:
+        usecols = [header.index(column) for column in COLUMNS]
+    except ValueError:
+        raise ValueError(f"CSV report has to contain {list(COLUMNS)} columns, got {header}")
+
+    return numpy.loadtxt(
+        lines,
+        dtype=REPORT_DTYPE,
+        delimiter=",",
+        usecols=usecols,
+        comments=None,
+        quotechar='"',
+        ndmin=1,
+    )
+
+
+def top(names, values, count):
+    """
+    Return up to `count` (name, value) pairs with the highest values, sorted in descending order.
+    """
+    count = min(count, len(values))
+    if count == 0:
+        return []
+    indexes = numpy.argpartition(values, len(values) - count)[-count:]
+    indexes = indexes[numpy.argsort(values[indexes])[::-1]]
+    return list(zip(names[indexes].tolist(), values[indexes].tolist()))
+
+
+def summarize(report, top_count=5):
+    """
+    Calculate report stats with vectorized reductions:
+        * `percent_90_max` - the highest `90 Percent` value
+        * `fail_rate_max` - the highest fail rate (`Fail` / `Pass` ratio) value
+        * `percent_90_p50` / `percent_90_p99` - median and 99th percentile of `90 Percent` values
+        * `top_percent_90` / `top_fail_rate` - `top_count` transactions with the highest values
+
+    Rows with zero `Pass` get infinite fail rate (or none at all if `Fail` is zero as well).
+    Stats of an empty report are zeros.
+    """
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        fail_rate = report["failed"] / report["passed"]
+    # NaN (0 / 0) rates are ignored by `fmax` and excluded from top list
+    fail_rate_known = ~numpy.isnan(fail_rate)
+
+    percent_90 = report["percent_90"]
+    if len(percent_90) == 0:
+        percent_90_p50, percent_90_p99 = 0.0, 0.0
+    else:
+        percent_90_p50, percent_90_p99 = numpy.percentile(percent_90, [50, 99]).tolist()
+
+    return {
+        "percent_90_max": float(numpy.max(percent_90, initial=0)),
+        "fail_rate_max": float(numpy.fmax.reduce(fail_rate, initial=0)),
+        "percent_90_p50": percent_90_p50,
+        "percent_90_p99": percent_90_p99,
+        "top_percent_90": top(report["name"], percent_90, top_count),
+        "top_fail_rate": top(report["name"][fail_rate_known], fail_rate[fail_rate_known], top_count),
+    }
@@ -0,0 +1,196 @@
+import array
+import collections
+import concurrent.futures
+import logging
+import operator
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir, os.pardir))
+import logscan
+
+
+# status code histogram size, codes out of [0, STATUS_SLOTS) range are accounted in slot 0
+STATUS_SLOTS = 600
+# chunks smaller than that are not worth sending to a separate process
+MIN_CHUNK_SIZE = 8 * 1024 * 1024
+# chunks per worker, more chunks give better balancing when some parts of the log are heavier
+CHUNKS_PER_WORKER = 4
+
+
+class LogStats(object):
+    """
+    Compact partial aggregates of the parsed log: bytes served and status codes histogram.
+    """
+    def __init__(self):
+        self.bytes_served = 0
+        self.status_codes = array.array("Q", bytes(8 * STATUS_SLOTS))
+        self.missed = 0
+
+    def add(self, status_code, bytes_served, count=1):
+        self.status_codes[status_code if 0 <= status_code < STATUS_SLOTS else 0] += count
+        self.bytes_served += bytes_served
+
+    def merge(self, other):
+        self.bytes_served += other.bytes_served
+        self.missed += other.missed
+        for status_code, count in enumerate(other.status_codes):
+            self.status_codes[status_code] += count
+        return self
+
+    @property
+    def failed(self):
+        return sum(self.status_codes[400:600])
+
+    @property
+    def succeed(self):
+        return sum(self.status_codes) - self.failed
+
+    @property
+    def failed_rate(self):
+        return self.failed / (self.failed + self.succeed)
+
+    def state(self):
+        """
+        Return JSON-serializable aggregates, `from_state()` restores them.
+        """
+        return {
+            "bytes_served": self.bytes_served,
+            "status_codes": {status_code: count for status_code, count in enumerate(self.status_codes) if count},
+            "missed": self.missed,
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        stats = cls()
+        stats.bytes_served = state["bytes_served"]
+        stats.missed = state["missed"]
+        for status_code, count in state["status_codes"].items():
+            stats.status_codes[int(status_code)] = count
+        return stats
+
+
+def chunk_offsets(path, chunks, start=0, end=None):
+    """
+    Split [start, end) byte range of `path` file (the whole file by default) into up to `chunks` (start, end) ranges,
+    each range ends right after a newline. `start` must point to a line start.
+    """
+    end = os.path.getsize(path) if end is None else end
+    offsets = [start]
+    with open(path, "rb") as fh:
+        for chunk in range(1, chunks):
+            position = max(start + (end - start) * chunk // chunks, offsets[-1])
+            if position >= end:
+                break
+            fh.seek(position)
+            fh.readline()
+            if end > fh.tell() > offsets[-1]:
+                offsets.append(fh.tell())
+    if offsets[-1] < end:
+        offsets.append(end)
+    return list(zip(offsets, offsets[1:]))
+
+
+def _collect(stats, found):
+    """
+    Add `logscan.findall()` results of (status_code, bytes) groups to `stats`.
+    """
+    # status codes are counted as raw bytes values, they are folded into the histogram afterwards
+    status_codes = collections.Counter()
+    bytes_served = 0
+    for results in found:
+        status_codes.update(map(operator.itemgetter(0), results))
+        bytes_served += sum(map(int, map(operator.itemgetter(1), results)))
+
+    for status_code, count in status_codes.items():
+        stats.add(int(status_code), 0, count)
+    stats.bytes_served += bytes_served
+    return stats
+
+
+def _miss_counter(stats):
+    def on_miss(line):
+        stats.missed += 1
+        logscan.log_miss(line)
+    return on_miss
+
+
+def parse_chunk(path, pattern, start, end):
+    """
+    Parse lines of `path` in [start, end) byte range with `pattern` bytes regexp, which has to define `status_code` and `bytes` groups. The file is memory-mapped and scanned
+    as bytes, only not matched lines are materialized in order to log them.
+    """
+    stats = LogStats()
+    with logscan.mapped(path) as buffer:
+        return _collect(stats, logscan.findall(buffer, pattern, start, end, _miss_counter(stats)))
+
+
+def parse_compressed(path, pattern):
+    """
+    Parse compressed `path` log with `pattern` bytes regexp, it is decompressed and scanned as a stream.
+    """
+    stats = LogStats()
+    return _collect(stats, logscan.findall_file(path, pattern, _miss_counter(stats)))
+
+
+def _run(tasks, workers):
+    stats = LogStats()
+    if workers == 1 or len(tasks) <= 1:
+        for function, *arguments in tasks:
+            stats.merge(function(*arguments))
+        return stats
+
+    with concurrent.futures.ProcessPoolExecutor(min(workers, len(tasks))) as executor:
+        futures = [executor.submit(*task) for task in tasks]
+        for future in futures:
+            stats.merge(future.result())
+    return stats
+
+
+def parse(path, pattern, workers=None, start=0, end=None):
+    """
+    Parse `path` log (or its [start, end) byte range) with `pattern` bytes regexp using up to `workers` processes
+    (CPU count by default). Each worker parses newline-aligned chunk of the file and returns only `LogStats` aggregates.
+    """
+    workers = workers or os.cpu_count()
+    end = os.path.getsize(path) if end is None else end
+    chunks = max(1, min(workers * CHUNKS_PER_WORKER, (end - start) // MIN_CHUNK_SIZE))
+    return _run([(parse_chunk, path, pattern, start, end) for start, end in chunk_offsets(path, chunks, start, end)], workers)
+
+
+def parse_many(paths, pattern, workers=None):
+    """
+    Parse `paths` logs, plain or compressed (see `logscan.codec()`), using up to `workers` processes.
+    Plain logs are split into chunks as in `parse()`, each compressed log is decompressed and parsed by a single worker
+    as a stream, so several compressed logs are processed at the same time and nothing is decompressed to disk.
+    """
+    workers = workers or os.cpu_count()
+    compressed, chunked = [], []
+    for path in paths:
+        if logscan.codec(path) is not None:
+            compressed.append((parse_compressed, path, pattern))
+            continue
+        chunks = max(1, min(workers * CHUNKS_PER_WORKER, os.path.getsize(path) // MIN_CHUNK_SIZE))
+        chunked += [(parse_chunk, path, pattern, start, end) for start, end in chunk_offsets(path, chunks)]
+    # compressed logs are the longest tasks, they are started first
+    return _run(compressed + chunked, workers)
+
+
+def parse_new(path, pattern, checkpoint, stats=None, workers=None):
+    """
+    Parse complete lines appended to `path` log since `checkpoint` (`logscan.Checkpoint`) position and add them
+    to `stats` (or to the aggregates saved in the checkpoint), so the cost depends on the new data only.
+    If the log was rotated or truncated, it is parsed from the start. Return aggregates of the whole log.
+    """
+    offset = checkpoint.resume(path)
+    if offset == 0:
+        stats = LogStats()
+    elif stats is None:
+        stats = LogStats.from_state(checkpoint.state)
+
+    with logscan.mapped(path) as buffer:
+        end = logscan.complete_end(buffer, offset)
+    if end > offset:
+        stats.merge(parse(path, pattern, workers, offset, end))
+    checkpoint.update(path, end, stats.state() if checkpoint.path else None)
+    return stats
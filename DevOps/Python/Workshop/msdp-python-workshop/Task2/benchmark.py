@@ -0,0 +1,89 @@
+import argparse
+import client
+import contextlib
+import logging
+import os
+import socket
+import subprocess
+import sys
+import time
+
+
+API_APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "API", "app.py")
+
+
+@contextlib.contextmanager
+def stub_server():
+    """
+    Launch local stand-in API server on a free port, yield its URL.
+    """
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    server = subprocess.Popen(
+        [sys.executable, API_APP],
+        env=dict(os.environ, PORT=str(port)),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        for _ in range(100):
+            with contextlib.suppress(OSError), socket.create_connection(("127.0.0.1", port), timeout=1):
+                break
+            time.sleep(0.1)
+        else:
+            raise RuntimeError("Stub API server did not start")
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def benchmark_api(args):
+    checks = [
+        (client.BYTES_SERVED_CHECK_ENDPOINT, {"bytes_served": n}) if n % 2 else
+        (client.FAILED_RATE_CHECK_ENDPOINT, {"failed_rate": n / args.checks})
+        for n in range(args.checks)
+    ]
+
+    with stub_server() as url:
+        client.API = client.api_client.ApiClient(url)
+
+        started = time.perf_counter()
+        sequential = [client.API.post(endpoint, data=payload).status_code for endpoint, payload in checks]
+        sequential_time = time.perf_counter() - started
+
+        for concurrency in args.concurrency:
+            started = time.perf_counter()
+            concurrent = client.api_check_many(checks, concurrency)
+            concurrent_time = time.perf_counter() - started
+
+            assert concurrent == sequential, "Status codes mismatch"
+            logging.info(
+                f"{args.checks} checks: sequential {args.checks / sequential_time:.0f} req/s, "
+                f"api_check_many(concurrency={concurrency}) {args.checks / concurrent_time:.0f} req/s"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Task2 benchmarks")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    api_parser = subparsers.add_parser("api", help="API checks throughput against local stub server")
+    api_parser.add_argument("--checks", type=int, default=1000)
+    api_parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 50])
+    api_parser.set_defaults(func=benchmark_api)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(
+        level=logging.DEBUG,
+        format='%(message)s',
+    )
+    logging.getLogger('asyncio').setLevel(logging.WARNING)
+
+    main()
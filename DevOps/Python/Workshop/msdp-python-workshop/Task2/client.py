@@ -1,7 +1,14 @@
+import os
 import re
-import requests
 import sys
 import logging
+import argparse
+import access_log
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+import api_client
+# access_log puts the shared modules directory on the path
+import logscan
 
 
 INPUT_FILE = "access.log"
@@ -11,28 +18,21 @@ TEST_ENDPOINT = "/task3/test"
 BYTES_SERVED_CHECK_ENDPOINT = "/task3/check_bytes_served"
 FAILED_RATE_CHECK_ENDPOINT = "/task3/check_failed_rate"
 
+# keep-alive session with retries, shared by all the API checks
+API = api_client.ApiClient(API_URL)
+
+STATUS_REGEXP = rb'HTTP.+" (?P<status_code>\d+) (?P<bytes>\d+) '
 
-def main():
-    # total number of bytes served from the log file
-    bytes_served = 0
-    # all the status codes from the log file
-    status_codes = []
 
+def main(input_files=(INPUT_FILE,), checkpoint=None):
     """
     Step 1.1. Put your compiled regexp for status code and bytes getting into `status_regexp_pattern` variable
     """
     ### Block implemented by student
     # status_regexp_pattern = re.compile(<your regexp for status code and bytes served parsing>)
-    status_regexp_pattern = re.compile("HTTP.+\" (?P<status_code>\d+) (?P<bytes>\d+) ")
+    # bytes pattern, log is parsed without decoding lines to str
+    status_regexp_pattern = re.compile(STATUS_REGEXP)
     ### Block implemented by student
-    with open(INPUT_FILE, "r") as logs:
-        for line in logs:
-            match = status_regexp_pattern.search(line)
-            if match:
-                status_codes.append(int(match.group("status_code")))
-                bytes_served += int(match.group("bytes"))
-            else:
-                logging.warning("Not matched")
 
     """
         Step 1.2. Read and parse log records:
@@ -47,14 +47,17 @@ def main():
                 * re.search + group()
     """
     ### Block implemented by student
-    # open `INPUT_FILE` in context manager
-        # for each line in input file
-            # search for status_regexp_pattern in line
-            # if there is match
-                # append matched status code (converted to int) to `status_codes` list
-                # increment `bytes_served` variable by value of bytes from current line
-            # otherwise
-                # print warning that line was not matched
+    # the file is split into newline-aligned chunks parsed by a pool of processes,
+    # each of them returns only bytes served and status codes histogram;
+    # compressed logs are decompressed on the fly, one log per process;
+    # with a checkpoint only lines appended since the previous run are parsed;
+    # globs of `input_files` are already expanded by the caller
+    if checkpoint is None:
+        log_stats = access_log.parse_many(input_files, status_regexp_pattern)
+    else:
+        log_stats = access_log.parse_new(input_files[0], status_regexp_pattern, checkpoint)
+    # total number of bytes served from the log file
+    bytes_served = log_stats.bytes_served
     ### Block implemented by student
 
     logging.info(f"Bytes served: {bytes_served}")
@@ -64,22 +67,11 @@ def main():
             * failed status codes (from 400 to 599, inclusive)
             * succeed status codes (all other)
     """
-    failed_codes_count = 0
-    succeed_codes_count = 0
     ### Block implemented by student
-    # iterate over status_codes
-        # when status code is in [400, 599] interval
-            # increment failed_codes_count
-        # otherwise
-            # increment succeed_codes_count
+    failed_codes_count = log_stats.failed
+    succeed_codes_count = log_stats.succeed
     ### Block implemented by student
 
-    for status_code in status_codes:
-        if status_code >= 400 and status_code <600:
-            failed_codes_count += 1
-        else:
-            succeed_codes_count += 1
-
     try:
         """
             Step 2.2. Calculate failed requests rate - what is the percentage of failed requests in the total (failed + succeed) requests number.
@@ -98,25 +90,52 @@ def main():
         Step 3.2. Validate bytes served, using previously implemented `api_check()` with two arguments:
             1) endpoint, defined in `BYTES_SERVED_CHECK_ENDPOINT`
             2) payload, dict - {"bytes_served": <value from `bytes_served` variable>}
-    """
-    ### Block implemented by student
-    # response_code = <your api_check() call>
-    response_code = api_check(BYTES_SERVED_CHECK_ENDPOINT, {"bytes_served": bytes_served})
-
-    ### Block implemented by student
-    assert response_code == 200, "Bytes served value is wrong, check the code again"
 
-    """
         Step 3.3. Validate failed requests rate, using previously implemented `api_check()` with two arguments:
             1) endpoint, defined in `FAILED_RATE_CHECK_ENDPOINT`
             2) payload, dict - {"failed_rate": <value from `failed_rate` variable>}
+
+        Both checks are independent, so they are sent together with `api_check_many()`.
     """
     ### Block implemented by student
     # response_code = <your api_check() call>
+    bytes_served_code, failed_rate_code = api_check_many([
+        (BYTES_SERVED_CHECK_ENDPOINT, {"bytes_served": bytes_served}),
+        (FAILED_RATE_CHECK_ENDPOINT, {"failed_rate": failed_rate}),
+    ])
     ### Block implemented by student
-    assert response_code == 200, "Failed rate value is wrong, check the code again"
+    assert bytes_served_code == 200, "Bytes served value is wrong, check the code again"
+    assert failed_rate_code == 200, "Failed rate value is wrong, check the code again"
 
     logging.info("All API checks passed, you are good")
+    API.log_latency()
+
+
+def follow(checkpoint, input_file=INPUT_FILE, interval=logscan.FOLLOW_INTERVAL):
+    """
+    Keep parsing lines appended to `input_file`, log bytes served and failed rate snapshots every `interval` seconds.
+    """
+    status_regexp_pattern = re.compile(STATUS_REGEXP)
+    log_stats = None
+
+    def step():
+        nonlocal log_stats
+        log_stats = access_log.parse_new(input_file, status_regexp_pattern, checkpoint, log_stats)
+        total = log_stats.failed + log_stats.succeed
+        failed_rate = log_stats.failed_rate if total else 0
+        logging.info(f"Requests: {total}, bytes served: {log_stats.bytes_served}, failed rate: {failed_rate}%")
+
+    logscan.follow(step, interval)
+
+
+def api_check_many(checks, concurrency=api_client.CONCURRENCY):
+    """
+    Validate each (endpoint, payload) pair from `checks` at `API_URL` concurrently,
+    with up to `concurrency` requests in flight.
+    It returns list of API returned status codes in the same order as `checks`,
+    a check failed with a network error or timeout gets its exception instead.
+    """
+    return API.post_many(checks, concurrency)
 
 
 def api_check(endpoint, payload):
@@ -128,8 +147,7 @@ def api_check(endpoint, payload):
     ### Block implemented by student
     # response = <POST request to API endpoint with `payload` in data>
     # return <response HTTP code>
-    response = requests.post(API_URL + endpoint, data=payload)
-    return response.status_code
+    return api_check_many([(endpoint, payload)], 1)[0]
 
     ### Block implemented by student
 
@@ -140,5 +158,27 @@ if __name__ == '__main__':
         format='%(message)s',
     )
     logging.getLogger('urllib3.connectionpool').setLevel(logging.CRITICAL)
+    logging.getLogger('asyncio').setLevel(logging.WARNING)
 
-    main()
+    parser = argparse.ArgumentParser(description="Parse access log and validate results with API")
+    parser.add_argument(
+        "logs", nargs="*", default=[INPUT_FILE],
+        help=f"log files or globs, gzip/bz2/xz/zstd compressed logs are accepted ({INPUT_FILE} by default)"
+    )
+    parser.add_argument(
+        "--checkpoint",
+        help="checkpoint file, the log is parsed only from the position saved there and results are added to saved ones"
+    )
+    parser.add_argument("--follow", action="store_true", help="keep parsing lines appended to the log, log results periodically")
+    parser.add_argument("--interval", type=float, default=logscan.FOLLOW_INTERVAL, help="seconds between --follow updates")
+    args = parser.parse_args()
+
+    input_files = logscan.expand(args.logs)
+    if (args.checkpoint or args.follow) and (len(input_files) != 1 or logscan.codec(input_files[0]) is not None):
+        parser.error("--checkpoint and --follow work with a single plain log only")
+
+    checkpoint = logscan.Checkpoint(args.checkpoint)
+    if args.follow:
+        follow(checkpoint, input_files[0], args.interval)
+    else:
+        main(input_files, checkpoint if args.checkpoint else None)
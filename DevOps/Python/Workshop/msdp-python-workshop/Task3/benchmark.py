@@ -0,0 +1,160 @@
+import argparse
+import deletion
+import logging
+import os
+import random
+import shutil
+import time
+
+import retention
+import utils
+
+from datetime import date
+from datetime import datetime
+from datetime import timedelta
+
+
+def generate_names(count, seed=0, junk=0):
+    """
+    Return `count` shuffled "YYYY-MM-DD" names of consecutive days back from 2020-11-22 plus `junk` not dated names.
+    """
+    rnd = random.Random(seed)
+    start = date(2020, 11, 22)
+    names = [(start - timedelta(days=delta)).isoformat() for delta in range(count)]
+    names += [f"tmp-{index}" for index in range(junk)]
+    rnd.shuffle(names)
+    return names
+
+
+def strptime_plan(dirs, monthly, weekly, daily):
+    """
+    Reference implementation: `datetime.strptime` per name, sorted lists and `list.remove` per kept directory.
+    """
+    dirs = list(dirs)
+    monthly_dirs, weekly_dirs, daily_dirs = [], [], []
+    for dir_name in dirs:
+        dir_date = datetime.strptime(dir_name, "%Y-%m-%d")
+        if dir_date.day == 1:
+            monthly_dirs.append(dir_name)
+        elif dir_date.weekday() == 6:
+            weekly_dirs.append(dir_name)
+        else:
+            daily_dirs.append(dir_name)
+    for dirs_list, count in ((monthly_dirs, monthly), (weekly_dirs, weekly), (daily_dirs, daily)):
+        for dir in sorted(dirs_list)[len(dirs_list) - count:] if count else []:
+            dirs.remove(dir)
+    return set(dirs)
+
+
+def benchmark_plan(args):
+    names = generate_names(args.dirs, args.seed)
+    for monthly, weekly, daily in args.keep:
+        started = time.perf_counter()
+        expected = strptime_plan(names, monthly, weekly, daily)
+        strptime_time = time.perf_counter() - started
+
+        started = time.perf_counter()
+        plan = retention.plan(names, monthly, weekly, daily)
+        plan_time = time.perf_counter() - started
+
+        assert set(plan.delete) == expected, "Plans mismatch"
+        logging.info(
+            f"{args.dirs} dirs, keep {monthly}/{weekly}/{daily}: strptime and list.remove {strptime_time * 1000:.0f}ms, "
+            f"retention.plan {plan_time * 1000:.0f}ms"
+        )
+
+
+def add_tree_arguments(parser, days, files):
+    parser.add_argument("--days", type=int, default=days, help="daily directories")
+    parser.add_argument("--depth", type=int, default=1, help="levels of subdirectories in a daily directory")
+    parser.add_argument("--fanout", type=int, default=4, help="subdirectories on each level")
+    parser.add_argument("--files", type=int, default=files, help="files per daily directory")
+    parser.add_argument("--size", type=int, default=4096, help="median file size in bytes")
+    parser.add_argument("--sigma", type=float, default=1.0, help="sigma of log-normal file sizes")
+
+
+def tree_layout(args):
+    return dict(
+        days=args.days, depth=args.depth, fanout=args.fanout, files=args.files, size=args.size,
+        sigma=args.sigma, seed=args.seed,
+    )
+
+
+def benchmark_seed(args):
+    for mode in args.modes:
+        started = time.perf_counter()
+        root_dir = utils.seed(prefix="seed-", dir=args.dir, mode=mode, workers=args.workers, **tree_layout(args))
+        elapsed = time.perf_counter() - started
+        # hardlinks are counted once
+        blocks = {}
+        for dir_path, _, names in os.walk(root_dir):
+            for name in names:
+                stat = os.lstat(os.path.join(dir_path, name))
+                blocks[stat.st_ino] = stat.st_blocks
+        disk = sum(blocks.values()) * 512
+        logging.info(
+            f"seed mode={mode} workers={args.workers}: {args.days} days x {args.files} files in {elapsed:.2f}s, "
+            f"{disk / 1024 ** 2:.1f} MiB on disk"
+        )
+        shutil.rmtree(root_dir)
+
+
+def benchmark_delete(args):
+    root_dir = utils.seed(prefix="delete-", dir=args.dir, mode=args.mode, **tree_layout(args))
+    try:
+        started = time.perf_counter()
+        shutil.rmtree(root_dir)
+        logging.info(f"shutil.rmtree: {args.days * args.files} files in {time.perf_counter() - started:.2f}s")
+
+        for workers in args.workers:
+            root_dir = utils.seed(prefix="delete-", dir=args.dir, mode=args.mode, **tree_layout(args))
+            stats = deletion.Deleter(workers, args.ops_per_second).delete([root_dir])
+            assert not os.path.exists(root_dir), "Tree was not removed"
+            logging.info(f"Deleter(workers={workers}, ops_per_second={args.ops_per_second}): {stats}")
+    finally:
+        if os.path.exists(root_dir):
+            shutil.rmtree(root_dir)
+
+
+def keep_counts(value):
+    return tuple(int(count) for count in value.split("/"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Task3 benchmarks")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--dir", help="directory for the generated trees (the system temporary one by default)")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    plan_parser = subparsers.add_parser("plan", help="strptime loop against vectorized retention planner")
+    plan_parser.add_argument("--dirs", type=int, default=100_000)
+    plan_parser.add_argument(
+        "--keep", type=keep_counts, nargs="+", default=[(2, 4, 5), (100, 500, 5000)],
+        help="monthly/weekly/daily counts to keep"
+    )
+    plan_parser.set_defaults(func=benchmark_plan)
+
+    seed_parser = subparsers.add_parser("seed", help="fixture generation in each of the seed modes")
+    add_tree_arguments(seed_parser, days=365, files=1000)
+    seed_parser.add_argument("--modes", choices=utils.SEED_MODES, nargs="+", default=utils.SEED_MODES)
+    seed_parser.add_argument("--workers", type=int, default=utils.SEED_WORKERS)
+    seed_parser.set_defaults(func=benchmark_seed)
+
+    delete_parser = subparsers.add_parser("delete", help="shutil.rmtree against the threaded deletion engine")
+    add_tree_arguments(delete_parser, days=100, files=100)
+    delete_parser.add_argument("--mode", choices=utils.SEED_MODES, default="write")
+    delete_parser.add_argument("--workers", type=int, nargs="+", default=[1, deletion.WORKERS, 32])
+    delete_parser.add_argument("--ops-per-second", type=float)
+    delete_parser.set_defaults(func=benchmark_delete)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(message)s',
+    )
+
+    main()
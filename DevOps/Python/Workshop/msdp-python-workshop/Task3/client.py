@@ -1,11 +1,93 @@
 import logging
+import retention
+import deletion
 import utils
 import os
-import shutil
+import time
 import argparse
+import yaml
 
 
-from datetime import datetime
+CONFIG_FILE = "config.yaml"
+DAEMON_INTERVAL = 60.0
+
+
+def log_level(cfg):
+    return logging.DEBUG if cfg.verbose else logging.INFO
+
+
+def log_stats(future):
+    logging.info(future.result())
+
+
+def apply_retention(root_dir, cfg, deleter, dry_run=False, trash=False):
+    """
+    Apply retention policy of `cfg` to the dated directories of `root_dir`.
+    """
+    """
+    Step 2.1. Put list with `root_dir` contents into `dirs` variable
+    """
+    ### Block implemented by student
+    #dirs = <list root_dir>
+    dirs = [name for name in os.listdir(path=root_dir) if name != deletion.TRASH_DIR]
+
+    ### Block implemented by student
+
+    """
+    Step 2.2. Sort directories by monthly, weekly and daily categories.
+    Step 2.3. Remove from `dirs` list all the directories we want to keep.
+
+        All the names are parsed at once and classified with vectorized date arithmetic,
+        the most recent directories of each category are picked without sorting whole lists.
+    """
+    ### Block implemented by student
+    plan = retention.plan(dirs, monthly=cfg.monthly, weekly=cfg.weekly, daily=cfg.daily)
+    for retention_class in retention.CLASSES:
+        for dir in plan.keep[retention_class]:
+            logging.debug(f"keeping {retention_class} {dir}")
+    ### Block implemented by student
+
+    if dry_run:
+        logging.info(f"{root_dir}:\n{plan.report()}")
+        return
+    paths = [os.path.join(root_dir, dir) for dir in plan.delete]
+    if not paths:
+        logging.debug(f"{root_dir}: nothing to remove")
+        return
+    if trash:
+        future = deleter.trash(paths, os.path.join(root_dir, deletion.TRASH_DIR))
+        logging.info(f"{root_dir}: moved {len(paths)} expired directories to trash, removing them in background")
+        future.add_done_callback(log_stats)
+    else:
+        logging.info(f"{root_dir}: {deleter.delete(paths)}")
+
+
+def daemon(config_file, roots, deleter, interval=DAEMON_INTERVAL, dry_run=False, trash=False):
+    """
+    Apply retention to all the `roots` every `interval` seconds until interrupted.
+    The config is parsed again only when the file changes, the previous one is used if the new one is broken.
+    """
+    cfg = None
+    try:
+        while True:
+            try:
+                loaded = utils.load_config(config_file)
+                if loaded is not cfg:
+                    logging.info(f"loaded {loaded}")
+                cfg = loaded
+            except (OSError, yaml.YAMLError, ValueError) as err:
+                if cfg is None:
+                    raise
+                logging.error(f"Failed to reload {config_file}, using the previous config: {err}")
+            logging.getLogger().setLevel(log_level(cfg))
+            for root_dir in roots:
+                try:
+                    apply_retention(root_dir, cfg, deleter, dry_run, trash)
+                except OSError as err:
+                    logging.error(f"Failed to apply retention to {root_dir}: {err}")
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        logging.info("Stopped")
 
 
 def main():
@@ -14,16 +96,35 @@ def main():
     """
     ### Block implemented by student
     # parser = <argparse.ArgumentParser class instance>
+    parser = argparse.ArgumentParser(description="Apply retention policy to dated directories")
     # <add `--config` argument support>
+    parser.add_argument("--config", default=CONFIG_FILE, help="yaml config with verbose flag and retention counts")
+    parser.add_argument(
+        "roots", nargs="*",
+        help="directories with dated subdirectories, a seeded temporary directory is used if none is given"
+    )
+    parser.add_argument("--dry-run", action="store_true", help="only report directories to keep and to remove")
+    parser.add_argument("--workers", type=int, default=deletion.WORKERS, help="threads removing files")
+    parser.add_argument("--ops-per-second", type=float, help="limit of unlink and rmdir calls per second")
+    parser.add_argument(
+        "--trash", action="store_true",
+        help=f"move expired directories to '{deletion.TRASH_DIR}' and remove them in background"
+    )
+    parser.add_argument("--daemon", action="store_true", help="apply retention to the roots repeatedly")
+    parser.add_argument("--interval", type=float, default=DAEMON_INTERVAL, help="seconds between daemon runs")
 
     # args = <parse supplied cmd arguments>
+    args = parser.parse_args()
     ### Block implemented by student
+    if args.daemon and not args.roots:
+        parser.error("--daemon requires roots")
 
     """
     Step 3.2. Use `Config` class from `utils` module to parse yaml config to Python object
     """
     ### Block implemented by student
     #cfg = <utils.Config class instance with hardcoded "config.yaml" config value>
+    cfg = utils.load_config(args.config)
     ### Block implemented by student
 
     """
@@ -32,71 +133,27 @@ def main():
     logging.basicConfig(
         ### Block implemented by student
         #level=<condition based on `verbose` config param>,
+        level=log_level(cfg),
         ### Block implemented by student
-        level=logging.DEBUG,
         format='%(message)s',
     )
 
-    root_dir = utils.seed(prefix="task2-")
-    logging.debug(root_dir)
-
-    # list with the monthly (created at the 1st day of the month) directories
-    monthly = []
-    # list with the weekly (created on Sundays) directories
-    weekly = []
-    # list with all other directories
-    daily = []
-
-    """
-    Step 2.1. Put list with `root_dir` contents into `dirs` variable
-    """
-    ### Block implemented by student
-    #dirs = <list root_dir>
-    dirs = os.listdir(path=root_dir)
-
-    ### Block implemented by student
-    for dir_name in dirs:
-        """
-        Step 2.2. Sort directories by monthly, weekly and daily categories.
-                  Memo:
-                    * `datetime` class has `strptime` method to convert string to datetime object
-                    * `datetime` object has properties and methods to get day and weekday:
-        """
-        ### Block implemented by student
-        # dir_date = <convert string to datetime objects>
-        #if <check if it is the 1st day of the month>:
-            # append `dir_name` to `monthly` list
-        #elif <check if it is Sunday>:
-            # append `dir_name` to `weekly` list
-        # otherwise
-            # append `dir_name` to `daily` list
-        ### Block implemented by student
-
-    """
-    Step 2.3. Remove from `dirs` list all the directories we want to keep.
-              Memo:
-                * sorting of monthly, weekly and daily lists will put directories in ascending order
-                * the fastest way to filter list (to keep only directories you want to remove) is slicing (negative should do the trick in that case)
-    """
-    ### Block implemented by student
-    #for dir in <monthly list slice with 2 the most recent dirs removed>:
-        logging.debug(f"keeping monthly {dir}")
-        dirs.remove(dir)
-    #for dir in <weekly list slice with 4 the most recent dirs removed>:
-        logging.debug(f"keeping weekly {dir}")
-        dirs.remove(dir)
-    #for dir in <daily list slice with 5 the most recent dirs removed>:
-        logging.debug(f"keeping daily {dir}")
-        dirs.remove(dir)
-    ### Block implemented by student
-
-    for dir in dirs:
-        logging.debug(f"removing {dir}")
-        shutil.rmtree(
-            os.path.join(root_dir, dir)
-        )
-
-    utils.cleanup(root_dir)
+    deleter = deletion.Deleter(args.workers, args.ops_per_second)
+    seeded_dir = None
+    try:
+        if args.daemon:
+            daemon(args.config, args.roots, deleter, args.interval, args.dry_run, args.trash)
+        else:
+            if not args.roots:
+                seeded_dir = utils.seed(prefix="task2-")
+                logging.debug(seeded_dir)
+            for root_dir in args.roots or [seeded_dir]:
+                apply_retention(root_dir, cfg, deleter, args.dry_run, args.trash)
+    finally:
+        # removal in background must finish before the seeded directory is cleaned up
+        deleter.shutdown()
+        if seeded_dir is not None:
+            utils.cleanup(seeded_dir)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,182 @@
+import argparse
+import logging
+import os
+import threading
+import time
+import uuid
+
+from concurrent.futures import ThreadPoolExecutor
+
+
+WORKERS = 8
+# directory for `Deleter.trash()`, it is not dated so the retention planner must skip it
+TRASH_DIR = ".trash"
+
+
+class TokenBucket(object):
+    """
+    Thread safe `rate` operations per second throttle allowing bursts of `burst` operations (one second by default).
+    A caller takes the token right away and sleeps for the debt, so waiting callers are served in turn.
+    """
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= tokens
+            wait = -self.tokens / self.rate
+        if wait > 0:
+            time.sleep(wait)
+
+
+class DeletionStats(object):
+    def __init__(self):
+        self.files = 0
+        self.dirs = 0
+        self.bytes = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.lock = threading.Lock()
+
+    def add(self, files=0, dirs=0, size=0, errors=0):
+        with self.lock:
+            self.files += files
+            self.dirs += dirs
+            self.bytes += size
+            self.errors += errors
+
+    def __str__(self):
+        rate = self.files / self.seconds if self.seconds else 0
+        return (
+            f"removed {self.files} files, {self.dirs} directories, {self.bytes / 1024 ** 2:.1f} MiB "
+            f"in {self.seconds:.2f}s ({rate:.0f} files/s), {self.errors} errors"
+        )
+
+
+class Deleter(object):
+    """
+    Replacement of `shutil.rmtree`: trees are walked with `os.scandir` and files are unlinked by a pool of `workers`
+    threads, so many unlinks are in flight on latency bound (network) filesystems. Every unlink and rmdir takes
+    a token of `ops_per_second` throttle if it is set.
+    """
+    def __init__(self, workers=WORKERS, ops_per_second=None):
+        self.workers = workers
+        self.throttle = TokenBucket(ops_per_second) if ops_per_second else None
+        self.background = ThreadPoolExecutor(max_workers=1)
+
+    def _remove(self, function, path, stats, **counters):
+        if self.throttle:
+            self.throttle.acquire()
+        try:
+            function(path)
+        except FileNotFoundError:
+            return
+        except OSError as err:
+            logging.error(f"Failed to remove '{path}': {err}")
+            stats.add(errors=1)
+            return
+        stats.add(**counters)
+
+    def _walk(self, path, pool, stats, in_flight):
+        """
+        Submit unlink of every file under `path` to `pool`, return directories, parents before children.
+        """
+        dirs, stack = [], [path]
+        while stack:
+            dir_path = stack.pop()
+            dirs.append(dir_path)
+            try:
+                entries = list(os.scandir(dir_path))
+            except OSError as err:
+                logging.error(f"Failed to list '{dir_path}': {err}")
+                stats.add(errors=1)
+                continue
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                    continue
+                try:
+                    size = entry.stat(follow_symlinks=False).st_size
+                except OSError:
+                    size = 0
+                # bounds the number of queued unlinks, walking does not run far ahead of the workers
+                in_flight.acquire()
+                future = pool.submit(self._remove, os.unlink, entry.path, stats, files=1, size=size)
+                future.add_done_callback(lambda _: in_flight.release())
+        return dirs
+
+    def delete(self, paths):
+        """
+        Remove `paths` (directories with all the content or files), return `DeletionStats`.
+        """
+        stats = DeletionStats()
+        started = time.perf_counter()
+        in_flight = threading.BoundedSemaphore(self.workers * 4)
+        dirs = []
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for path in paths:
+                if os.path.isdir(path) and not os.path.islink(path):
+                    dirs.extend(self._walk(path, pool, stats, in_flight))
+                else:
+                    in_flight.acquire()
+                    pool.submit(self._remove, os.unlink, path, stats, files=1).add_done_callback(
+                        lambda _: in_flight.release()
+                    )
+        # all files are gone, directories are removed children first
+        for dir_path in reversed(dirs):
+            self._remove(os.rmdir, dir_path, stats, dirs=1)
+        stats.seconds = time.perf_counter() - started
+        return stats
+
+    def trash(self, paths, trash_dir):
+        """
+        Rename `paths` into `trash_dir` (it must be on the same filesystem) and delete them in a background thread.
+        Returns right after the renames with a future of `DeletionStats`.
+        """
+        os.makedirs(trash_dir, exist_ok=True)
+        trashed = []
+        for path in paths:
+            # unique name, a directory with the same name may still be in the trash after an interrupted run
+            trashed_path = os.path.join(trash_dir, f"{os.path.basename(path)}-{uuid.uuid4().hex[:8]}")
+            os.rename(path, trashed_path)
+            trashed.append(trashed_path)
+        logging.debug(f"moved {len(trashed)} entries to '{trash_dir}'")
+        return self.background.submit(self.delete, trashed)
+
+    def shutdown(self, wait=True):
+        self.background.shutdown(wait=wait)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Remove directory trees with a pool of threads")
+    parser.add_argument("paths", nargs="+")
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--ops-per-second", type=float, help="limit of unlink and rmdir calls per second")
+    parser.add_argument("--trash", help="rename paths into this directory first, then delete them")
+    args = parser.parse_args()
+
+    deleter = Deleter(args.workers, args.ops_per_second)
+    if args.trash:
+        future = deleter.trash(args.paths, args.trash)
+        logging.info(f"moved {len(args.paths)} paths to '{args.trash}'")
+        stats = future.result()
+    else:
+        stats = deleter.delete(args.paths)
+    deleter.shutdown()
+    logging.info(stats)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(message)s',
+    )
+
+    main()
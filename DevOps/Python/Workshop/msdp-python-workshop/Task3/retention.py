@@ -0,0 +1,117 @@
+import logging
+
+import numpy
+
+
+CLASSES = ["monthly", "weekly", "daily"]
+# numpy day number of the Sunday, days are counted from 1970-01-01 which is Thursday
+SUNDAY = 3
+# shape of the date names, digits are checked for "Y", "M" and "D"
+DATE_FORMAT = "YYYY-MM-DD"
+
+
+class RetentionPlan(object):
+    """
+    Result of `plan()`: names to keep per retention class (newest first), names to delete
+    and names which are not dates (they are neither kept nor deleted).
+    """
+    def __init__(self, keep, delete, ignored, totals):
+        self.keep = keep
+        self.delete = delete
+        self.ignored = ignored
+        self.totals = totals
+
+    @property
+    def kept(self):
+        return {name for names in self.keep.values() for name in names}
+
+    def report(self):
+        """
+        Return human readable summary of the plan.
+        """
+        lines = [
+            f"{retention_class}: keeping {len(self.keep[retention_class])} of {self.totals[retention_class]}"
+            f" ({', '.join(self.keep[retention_class]) or 'none'})"
+            for retention_class in CLASSES
+        ]
+        lines.append(f"removing {len(self.delete)} directories, ignoring {len(self.ignored)} not dated entries")
+        return "\n".join(lines)
+
+
+def parse_dates(names):
+    """
+    Parse "YYYY-MM-DD" `names` into `datetime64[D]` array, return it with a mask of names which are such dates
+    (other names get NaT). Digits are checked and converted as character codes, so names which are not dates
+    do not make the whole array fall back to parsing names one by one.
+    """
+    strings = numpy.array(names, dtype=str)
+    valid = numpy.char.str_len(strings) == len(DATE_FORMAT)
+    # UTF-32 code points of the first `DATE_FORMAT` characters, a row per name
+    codes = strings.astype(f"<U{len(DATE_FORMAT)}").view(numpy.uint32).reshape(-1, len(DATE_FORMAT))
+    codes = codes.astype(numpy.int64)
+    digits = codes - ord("0")
+    for position, character in enumerate(DATE_FORMAT):
+        if character == "-":
+            valid &= codes[:, position] == ord("-")
+        else:
+            valid &= (digits[:, position] >= 0) & (digits[:, position] <= 9)
+
+    def number(start, end):
+        return (digits[:, start:end] * 10 ** numpy.arange(end - start - 1, -1, -1)).sum(axis=1)
+
+    year, month, day = number(0, 4), number(5, 7), number(8, 10)
+    valid &= (month >= 1) & (month <= 12) & (day >= 1)
+    months = numpy.where(valid, (year - 1970) * 12 + month - 1, 0)
+    month_start = months.astype("datetime64[M]").astype("datetime64[D]")
+    month_days = ((months + 1).astype("datetime64[M]").astype("datetime64[D]") - month_start).astype(numpy.int64)
+    valid &= day <= month_days
+    dates = numpy.where(valid, month_start + (day - 1), numpy.datetime64("NaT", "D"))
+    return dates, valid
+
+
+def newest(days, indexes, count):
+    """
+    Return up to `count` of `indexes` with the greatest `days`, newest first.
+    """
+    if count <= 0:
+        return indexes[:0]
+    if count < len(indexes):
+        indexes = indexes[numpy.argpartition(-days[indexes], count - 1)[:count]]
+    return indexes[numpy.argsort(-days[indexes], kind="stable")]
+
+
+def plan(names, monthly=0, weekly=0, daily=0):
+    """
+    Decide which of date named `names` to keep: `monthly` newest dates of the 1st day of the month,
+    `weekly` newest Sundays (which are not the 1st day of the month) and `daily` newest of all the other dates.
+    Names are classified all at once with vectorized date arithmetic.
+    """
+    names = list(names)
+    dates, valid = parse_dates(names)
+    days = dates.astype(numpy.int64)
+
+    first_day = (dates - dates.astype("datetime64[M]")) == numpy.timedelta64(0, "D")
+    sunday = (days - SUNDAY) % 7 == 0
+    masks = {
+        "monthly": valid & first_day,
+        "weekly": valid & sunday & ~first_day,
+        "daily": valid & ~sunday & ~first_day,
+    }
+    counts = {"monthly": monthly, "weekly": weekly, "daily": daily}
+
+    keep_mask = numpy.zeros(len(names), dtype=bool)
+    keep = {}
+    for retention_class in CLASSES:
+        kept = newest(days, numpy.flatnonzero(masks[retention_class]), counts[retention_class])
+        keep_mask[kept] = True
+        keep[retention_class] = [names[index] for index in kept.tolist()]
+
+    retention_plan = RetentionPlan(
+        keep,
+        [names[index] for index in numpy.flatnonzero(valid & ~keep_mask).tolist()],
+        [names[index] for index in numpy.flatnonzero(~valid).tolist()],
+        {retention_class: int(mask.sum()) for retention_class, mask in masks.items()},
+    )
+    for name in retention_plan.ignored:
+        logging.warning(f"ignoring '{name}', it is not a date")
+    return retention_plan
@@ -1,20 +1,49 @@
+import errno
 import os
+import itertools
+import math
+import random
 import tempfile
+import time
 import shutil
 import logging
 import yaml
 
 
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from datetime import timedelta
 
+try:
+    # libyaml based loader is several times faster, it is not available when PyYAML is built without libyaml
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
 
-def seed(suffix=None, prefix=None):
-    root_dir = tempfile.mkdtemp(suffix, prefix)
-    now = datetime.utcnow()
+
+DAYS = 100
+SEED_WORKERS = 8
+# "write" fills files with zeros, "sparse" only sets their size, "hardlink" links them to a single file
+SEED_MODES = ["write", "sparse", "hardlink"]
+WRITE_BUFFER = bytes(1024 ** 2)
+# hardlinks of a single template file, ext4 allows up to 65000 links of an inode
+TEMPLATE_LINKS = 60_000
+RETENTION_KEYS = ["monthly", "weekly", "daily"]
+# config file path -> ((mtime, size), Config), see `load_config()`
+CONFIG_CACHE = {}
+
+
+def seed(suffix=None, prefix=None, dir=None, days=DAYS, now=None, **layout):
+    """
+    Create temporary directory (in `dir` if set) with `days` directories named by dates back from `now` (UTC now by default),
+    `layout` keyword arguments of `seed_tree()` fill them with files.
+    """
+    root_dir = tempfile.mkdtemp(suffix, prefix, dir)
+    now = now or datetime.utcnow()
 
     logging.debug(f"seeding '{root_dir}'")
-    for delta in range(0, 100):
+    daily_dirs = []
+    for delta in range(0, days):
         """
         Step 1. Construct `daily_dir` based on `now` (datetime object with current date) and `delta` (increment).
                 Memo:
@@ -28,29 +57,163 @@ def seed(suffix=None, prefix=None):
         """
         ### Block implemented by student
         # daily_dir = <difference between `now` and `timedelta` with "delta" days, converted to string "YYYY-MM-DD">
+        daily_dir = (now - timedelta(days=delta)).date().isoformat()
         ### Block implemented by student
-        new_dir = os.path.join(root_dir, daily_dir)
-        os.makedirs(new_dir)
-        logging.debug(f"creating '{new_dir}'")
+        daily_dirs.append(daily_dir)
 
+    seed_tree(root_dir, daily_dirs, **layout)
     return root_dir
 
 
+def tree_layout(name, depth=0, fanout=1, files=0, size=0, sigma=0.0, seed=0):
+    """
+    Return directories and (path, size) files of `name` directory: `depth` levels of `fanout` subdirectories
+    with `files` files spread over the deepest ones. Sizes are log-normal around the `size` median
+    (the same size for `sigma` 0). The layout depends only on `name` and `seed`.
+    """
+    rnd = random.Random(f"{seed}:{name}")
+    leaves = [
+        os.path.join(name, *(f"d{index}" for index in indexes))
+        for indexes in itertools.product(range(fanout), repeat=depth)
+    ]
+    file_list = []
+    for index in range(files):
+        file_size = round(rnd.lognormvariate(math.log(size), sigma)) if size and sigma else size
+        file_list.append((os.path.join(leaves[index % len(leaves)], f"file-{index}"), file_size))
+    return leaves, file_list
+
+
+class _Template(object):
+    """
+    File of `size` bytes the seeded files are hardlinked to. A new file is written after `TEMPLATE_LINKS` links,
+    or when the filesystem refuses one more link (EMLINK), so large layouts do not hit the per-inode links limit.
+    """
+    def __init__(self, path, size):
+        self.path = path
+        self.size = size
+        self.links = None
+
+    def _write(self):
+        self.remove()
+        _write_file(self.path, self.size, "write", None)
+        self.links = 0
+
+    def link(self, path):
+        if self.links is None or self.links >= TEMPLATE_LINKS:
+            self._write()
+        try:
+            os.link(self.path, path)
+        except OSError as err:
+            if err.errno != errno.EMLINK or not self.links:
+                raise
+            self._write()
+            os.link(self.path, path)
+        self.links += 1
+
+    def remove(self):
+        # the linked files keep the data
+        if self.links is not None:
+            os.remove(self.path)
+            self.links = None
+
+
+def _write_file(path, size, mode, template):
+    if mode == "hardlink":
+        template.link(path)
+        return
+    with open(path, "wb") as fh:
+        if mode == "sparse":
+            fh.truncate(size)
+            return
+        while size > 0:
+            size -= fh.write(WRITE_BUFFER[:size])
+
+
+def _seed_dir(root_dir, index, name, mode, layout):
+    leaves, file_list = tree_layout(name, **layout)
+    for leaf in leaves:
+        os.makedirs(os.path.join(root_dir, leaf))
+    # every directory links to its own templates, so threads do not share them
+    template = _Template(os.path.join(root_dir, f".seed-template-{index}"), layout.get("size", 0))
+    try:
+        for path, size in file_list:
+            _write_file(os.path.join(root_dir, path), size, mode, template)
+    finally:
+        template.remove()
+    return len(file_list), sum(size for _, size in file_list)
+
+
+def seed_tree(root_dir, names, mode="write", workers=SEED_WORKERS, **layout):
+    """
+    Create `names` directories in `root_dir` laid out by `tree_layout()` with `layout` keyword arguments,
+    directories are filled by a pool of `workers` threads. Sparse files and hardlinks take almost no disk space,
+    hardlinks all have the median size. Returns number of files and their logical size.
+    """
+    if mode not in SEED_MODES:
+        raise ValueError(f"Unknown seed mode '{mode}', expected one of {SEED_MODES}")
+    started = time.perf_counter()
+    if mode == "hardlink":
+        layout = dict(layout, sigma=0.0)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        created = list(pool.map(
+            lambda indexed: _seed_dir(root_dir, *indexed, mode, layout), enumerate(names)
+        ))
+    files, size = sum(files for files, _ in created), sum(size for _, size in created)
+    logging.debug(
+        f"seeded {len(names)} directories with {files} files, {size / 1024 ** 2:.1f} MiB "
+        f"in {time.perf_counter() - started:.2f}s"
+    )
+    return files, size
+
+
 def cleanup(dir):
     logging.debug(f"removing '{dir}'")
     shutil.rmtree(dir)
 
 
 class Config(object):
+    """
+    Parsed and validated config, it is read only. Use `load_config()` to reuse already parsed files.
+    """
+    __slots__ = ["config_file", "cfg", "_verbose", "_monthly", "_weekly", "_daily"]
+
     def __init__(self, config_file):
-        self.config_file = config_file
+        set_attribute = super().__setattr__
+        set_attribute("config_file", config_file)
         """
         Step 3.1.1. Read and parse yaml from `self.config_file` to `self.cfg` as Python dictionary
         """
         ### Block implemented by student
         # self.cfg = <dict constructed from yaml, loaded from `self.config_file`>
+        with open(self.config_file) as fh:
+            set_attribute("cfg", yaml.load(fh, Loader=SafeLoader) or {})
         ### Block implemented by student
 
+        # values are validated once, properties do not look them up in the dict on every access
+        if not isinstance(self.cfg, dict):
+            raise ValueError(f"{self.config_file}: config must be a mapping")
+        verbose = self.cfg.get("verbose", False)
+        if not isinstance(verbose, bool):
+            raise ValueError(f"{self.config_file}: 'verbose' must be true or false, got {verbose!r}")
+        set_attribute("_verbose", verbose)
+        retention = self.cfg.get("retention") or {}
+        if not isinstance(retention, dict):
+            raise ValueError(f"{self.config_file}: 'retention' must be a mapping")
+        for key in RETENTION_KEYS:
+            value = retention.get(key, 0)
+            if isinstance(value, bool) or not isinstance(value, int) or value < 0:
+                raise ValueError(f"{self.config_file}: 'retention.{key}' must be a non-negative integer, got {value!r}")
+            set_attribute(f"_{key}", value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is read only")
+
+    def __repr__(self):
+        return (
+            f"Config({self.config_file!r}, verbose={self.verbose}, "
+            f"monthly={self.monthly}, weekly={self.weekly}, daily={self.daily})"
+        )
+
     @property
     def verbose(self):
         """
@@ -58,6 +221,7 @@ class Config(object):
         """
         ### Block implemented by student
         # return <>
+        return self._verbose
         ### Block implemented by student
 
     @property
@@ -67,6 +231,7 @@ class Config(object):
         """
         ### Block implemented by student
         # return <>
+        return self._monthly
         ### Block implemented by student
 
     @property
@@ -76,6 +241,7 @@ class Config(object):
         """
         ### Block implemented by student
         # return <>
+        return self._weekly
         ### Block implemented by student
 
     @property
@@ -85,4 +251,19 @@ class Config(object):
         """
         ### Block implemented by student
         # return <>
+        return self._daily
         ### Block implemented by student
+
+
+def load_config(config_file):
+    """
+    Return `Config` of `config_file`, the file is parsed again only when its modification time or size changes.
+    """
+    stat = os.stat(config_file)
+    key = (stat.st_mtime_ns, stat.st_size)
+    cached = CONFIG_CACHE.get(config_file)
+    if cached and cached[0] == key:
+        return cached[1]
+    config = Config(config_file)
+    CONFIG_CACHE[config_file] = (key, config)
+    return config
@@ -0,0 +1,245 @@
+import argparse
+import csv
+import dump
+import export
+import gzip
+import logging
+import os
+import random
+import shutil
+import sqlite3
+import subprocess
+import tempfile
+import time
+
+import loader
+
+
+# the same table as created by create_db.sh, plus an index to show deferred index creation
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS employees
+  (
+      [EmployeeId] INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+      [LastName] NVARCHAR(20)  NOT NULL,
+      [FirstName] NVARCHAR(20)  NOT NULL,
+      [Title] NVARCHAR(30),
+      [BirthDate] DATETIME,
+      [HireDate] DATETIME,
+      [Address] NVARCHAR(70),
+      [City] NVARCHAR(40),
+      [State] NVARCHAR(40),
+      [Country] NVARCHAR(40),
+      [PostalCode] NVARCHAR(10),
+      [Phone] NVARCHAR(24),
+      [Fax] NVARCHAR(24),
+      [Email] NVARCHAR(60)
+  );
+CREATE INDEX IF NOT EXISTS employees_name ON employees (LastName, FirstName);
+"""
+FIELDNAMES = [
+    "LastName", "FirstName", "Title", "BirthDate", "HireDate", "Address", "City",
+    "State", "Country", "PostalCode", "Phone", "Fax", "Email",
+]
+LAST_NAMES = ["Adams", "Edwards", "Peacock", "Park", "Johnson", "Mitchell", "King", "Callahan", "O'Brien"]
+FIRST_NAMES = ["Andrew", "Nancy", "Jane", "Margaret", "Steve", "Michael", "Robert", "Laura"]
+TITLES = ["General Manager", "Sales Manager", "Sales Support Agent", "IT Manager", "IT Staff"]
+CITIES = ["Edmonton", "Calgary", "Lethbridge"]
+
+
+def generate_csv(path, rows, seed=0):
+    """
+    Write CSV file with `rows` employees like in data.csv, the same `seed` gives the same content.
+    """
+    rnd = random.Random(seed)
+    with open(path, "w", newline="") as fh:
+        writer = csv.writer(fh)
+        writer.writerow(FIELDNAMES)
+        for row in range(rows):
+            last_name, first_name = rnd.choice(LAST_NAMES), rnd.choice(FIRST_NAMES)
+            writer.writerow([
+                last_name, first_name, rnd.choice(TITLES),
+                f"{rnd.randint(1, 12)}/{rnd.randint(1, 28)}/{rnd.randint(1940, 2000)}",
+                f"{rnd.randint(1, 12)}/{rnd.randint(1, 28)}/{rnd.randint(2000, 2020)}",
+                f"{rnd.randint(1, 9999)} {rnd.randint(1, 99)} Ave SW", rnd.choice(CITIES), "AB", "Canada",
+                f"T{rnd.randint(1, 9)}P {rnd.randint(1, 9)}M{rnd.randint(1, 9)}",
+                f"+1 (403) {rnd.randint(100, 999)}-{rnd.randint(1000, 9999)}",
+                f"+1 (403) {rnd.randint(100, 999)}-{rnd.randint(1000, 9999)}",
+                f"{first_name.lower()}{row}@epam.net",
+            ])
+
+
+def create_database(path):
+    if os.path.exists(path):
+        os.remove(path)
+    for suffix in ("-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    connection = sqlite3.connect(path)
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def row_by_row(connection, csv_reader):
+    """
+    Reference implementation: formatted INSERT query and commit per row.
+    """
+    fieldnames = str(csv_reader.fieldnames)[1:-1]
+    for row in csv_reader:
+        values = str(list(row.values()))[1:-1]
+        connection.execute(f"INSERT INTO employees ({fieldnames}) VALUES ({values})")
+        connection.commit()
+
+
+def measure(function, database, csv_path, *args):
+    connection = create_database(database)
+    try:
+        with open(csv_path, newline="") as fh:
+            started = time.perf_counter()
+            function(connection, csv.DictReader(fh), *args)
+            elapsed = time.perf_counter() - started
+        rows = connection.execute("SELECT count(*) FROM employees").fetchone()[0]
+    finally:
+        connection.close()
+    return rows, elapsed
+
+
+def benchmark_load(args):
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp_dir:
+        database = os.path.join(tmp_dir, "database.sqlite")
+        baseline_csv, bulk_csv = os.path.join(tmp_dir, "baseline.csv"), os.path.join(tmp_dir, "bulk.csv")
+        generate_csv(baseline_csv, args.baseline_rows, args.seed)
+        generate_csv(bulk_csv, args.rows, args.seed)
+
+        rows, elapsed = measure(row_by_row, database, baseline_csv)
+        logging.info(f"row by row: {rows} rows, {rows / elapsed:.0f} rows/s")
+
+        for profile in sorted(loader.LOAD_PROFILES):
+            for defer_indexes in (False, True):
+                rows, elapsed = measure(
+                    lambda connection, csv_reader: loader.load(
+                        connection, "employees", csv_reader, profile=profile, defer_indexes=defer_indexes
+                    ),
+                    database, bulk_csv,
+                )
+                assert rows == args.rows, f"Loaded {rows} rows instead of {args.rows}"
+                logging.info(f"loader profile={profile} defer_indexes={defer_indexes}: {rows} rows, {rows / elapsed:.0f} rows/s")
+
+
+def cli_dump(database, output):
+    """
+    Reference implementation: `sqlite3 <database> .dump | gzip -c > <output>`.
+    """
+    with open(output, "wb") as fh:
+        p1 = subprocess.Popen(["sqlite3", database, ".dump"], stdout=subprocess.PIPE)
+        p2 = subprocess.Popen(["gzip", "-c"], stdin=p1.stdout, stdout=fh)
+        p1.stdout.close()
+        p2.communicate()
+        p1.wait()
+
+
+def benchmark_dump(args):
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp_dir:
+        database, output = os.path.join(tmp_dir, "database.sqlite"), os.path.join(tmp_dir, "database.dump.gz")
+        csv_path = os.path.join(tmp_dir, "data.csv")
+        generate_csv(csv_path, args.rows, args.seed)
+        measure(lambda connection, csv_reader: loader.load(connection, "employees", csv_reader), database, csv_path)
+
+        if shutil.which("sqlite3") and shutil.which("gzip"):
+            started = time.perf_counter()
+            cli_dump(database, output)
+            logging.info(
+                f"sqlite3 | gzip: {time.perf_counter() - started:.2f}s, {os.path.getsize(output) / 1024 ** 2:.1f} MiB"
+            )
+
+        for threads in args.threads:
+            started = time.perf_counter()
+            with open(output, "wb") as fh:
+                dumped = dump.dump(database, fh, args.codec, args.level, threads)
+            elapsed = time.perf_counter() - started
+            if args.codec == "gzip":
+                with gzip.open(output) as fh:
+                    assert len(fh.read()) == dumped, "Dump is not readable back"
+            logging.info(
+                f"dump.dump(codec={args.codec}, threads={threads}): {elapsed:.2f}s, "
+                f"{dumped / 1024 ** 2 / elapsed:.0f} MiB/s, {os.path.getsize(output) / 1024 ** 2:.1f} MiB"
+            )
+
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+def benchmark_export(args):
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp_dir:
+        database, csv_path = os.path.join(tmp_dir, "database.sqlite"), os.path.join(tmp_dir, "data.csv")
+        generate_csv(csv_path, args.rows, args.seed)
+        measure(lambda connection, csv_reader: loader.load(connection, "employees", csv_reader), database, csv_path)
+
+        dump_path, replayed = os.path.join(tmp_dir, "database.dump.gz"), os.path.join(tmp_dir, "replayed.sqlite")
+        started = time.perf_counter()
+        with open(dump_path, "wb") as fh:
+            dump.dump(database, fh)
+        dump_time = time.perf_counter() - started
+        started = time.perf_counter()
+        connection = sqlite3.connect(replayed)
+        with gzip.open(dump_path, "rt") as fh:
+            connection.executescript(fh.read())
+        connection.close()
+        logging.info(
+            f"SQL dump: {os.path.getsize(dump_path) / 1024 ** 2:.1f} MiB, "
+            f"dump {dump_time:.2f}s, replay {time.perf_counter() - started:.2f}s"
+        )
+
+        for file_format in args.formats:
+            output_dir, restored = os.path.join(tmp_dir, file_format), os.path.join(tmp_dir, f"{file_format}.sqlite")
+            started = time.perf_counter()
+            export.export(database, "employees", output_dir, file_format, args.chunk_rows, args.workers)
+            export_time = time.perf_counter() - started
+            started = time.perf_counter()
+            rows = export.restore(output_dir, restored, args.workers)
+            assert rows == args.rows, f"Restored {rows} rows instead of {args.rows}"
+            logging.info(
+                f"{file_format} export: {directory_size(output_dir) / 1024 ** 2:.1f} MiB, "
+                f"export {export_time:.2f}s, restore {time.perf_counter() - started:.2f}s"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Task4 benchmarks")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--dir", help="directory for the database and CSV files (a temporary one by default)")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    load_parser = subparsers.add_parser("load", help="row by row inserts against the bulk loader")
+    load_parser.add_argument("--rows", type=int, default=1_000_000, help="rows loaded by the bulk loader")
+    load_parser.add_argument(
+        "--baseline-rows", type=int, default=2000,
+        help="rows loaded row by row, the commit per row is too slow to load all the --rows"
+    )
+    load_parser.set_defaults(func=benchmark_load)
+
+    dump_parser = subparsers.add_parser("dump", help="sqlite3 and gzip binaries pipe against the in-process dump")
+    dump_parser.add_argument("--rows", type=int, default=1_000_000)
+    dump_parser.add_argument("--codec", choices=sorted(dump.DEFAULT_LEVELS), default="gzip")
+    dump_parser.add_argument("--level", type=int)
+    dump_parser.add_argument("--threads", type=int, nargs="+", default=[1, os.cpu_count()])
+    dump_parser.set_defaults(func=benchmark_dump)
+
+    export_parser = subparsers.add_parser("export", help="SQL dump and replay against columnar export and restore")
+    export_parser.add_argument("--rows", type=int, default=1_000_000)
+    export_parser.add_argument("--formats", choices=export.FORMATS, nargs="+", default=["npz"])
+    export_parser.add_argument("--chunk-rows", type=int, default=export.CHUNK_ROWS)
+    export_parser.add_argument("--workers", type=int)
+    export_parser.set_defaults(func=benchmark_export)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(message)s',
+    )
+
+    main()
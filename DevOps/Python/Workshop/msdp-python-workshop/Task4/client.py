@@ -5,6 +5,8 @@ import logging
 import os
 import sys
 import pathlib
+import loader
+import dump
 
 
 BASH_FILE = "./create_db.sh"
@@ -12,6 +14,8 @@ DATABASE_NAME = "database.sqlite"
 TABLE_NAME = "employees"
 DATA_FILE = "data.csv"
 DATABASE_DUMP_NAME = "database.dump.gz"
+# one of `loader.LOAD_PROFILES`
+LOAD_PROFILE = "default"
 
 
 def main():
@@ -92,19 +96,11 @@ def main():
             """
             ### Block implemented by student
             # fieldnames = <SQL compatible string with field names>
-            fieldnames = str(csv_reader.fieldnames)[1:-1]
-            # iterate over rows from csv_reader
-            for row in csv_reader:
-                # values = <SQL compatible string with values to insert>
-                values = str(list(row.values()))[1:-1]
-                # query = <string with SQL query>
-                # <execute the query>
-                query = f"INSERT INTO {TABLE_NAME} ({fieldnames}) VALUES ({values})"
-                # <commit changes to database>
-                cursor.execute(query)
-                sqliteConnection.commit()
-                # logging.debug(<message with inserted rows count>)
-                logging.debug(f"Inserted rows count - {cursor.rowcount}")
+            # values = <SQL compatible string with values to insert>
+            # query = <string with SQL query>
+            # rows are sent in batches with `?` placeholders instead of formatted values,
+            # all of them are committed by a single transaction
+            loader.load(sqliteConnection, TABLE_NAME, csv_reader, profile=LOAD_PROFILE)
             ### Block implemented by student
             """
             Step 3.3. Query `TABLE_NAME` in order to find how many rows are in the table to validate results.
@@ -157,14 +153,11 @@ def main():
             pass
             ### Block implemented by student
             # p1 = <subprocess method call to execute sqlite3 binary with arguments and redurect stdout to pipe,
-            p1 = subprocess.Popen(["sqlite3", DATABASE_NAME, ".dump"], stdout=subprocess.PIPE)
-
             # p2 = <subprocess method call to execute gzip binary, get stdin from `p1` stdout and redirect stdout to `dump_handler`
-            p2 = subprocess.Popen(["gzip", "-c"], stdin=p1.stdout, stdout=dump_handler)
-                        
             # link `p1` with `p2` together using `.communicate()`
-
-            p2.communicate()
+            # the dump is produced in process (no sqlite3 and gzip binaries needed) from a consistent snapshot,
+            # gzip blocks are compressed by a pool of threads
+            dump.dump(DATABASE_NAME, dump_handler)
             ### Block implemented by student
         logging.debug(f"Dumped {DATABASE_NAME} to {DATABASE_DUMP_NAME}")
     except Exception as error:
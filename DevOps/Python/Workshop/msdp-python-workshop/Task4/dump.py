@@ -0,0 +1,139 @@
+import argparse
+import collections
+import concurrent.futures
+import logging
+import os
+import pathlib
+import sqlite3
+import time
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+# uncompressed bytes per gzip member, each member is compressed by a separate thread
+BLOCK_SIZE = 1024 * 1024
+DEFAULT_LEVELS = {
+    "gzip": 6,
+    "zstd": 3,
+}
+
+
+class ParallelGzipWriter(object):
+    """
+    Binary file-like writer which compresses data in `block_size` blocks on a pool of `threads` threads.
+    Each block becomes a separate gzip member, concatenated members are a valid gzip file (RFC 1952),
+    which is read back by `gzip -d` and Python `gzip` module as a whole. zlib releases the GIL while compressing,
+    so blocks are compressed in parallel. Blocks are written in order, at most two blocks per thread are in flight.
+    """
+    def __init__(self, fh, level=DEFAULT_LEVELS["gzip"], threads=None, block_size=BLOCK_SIZE):
+        self.fh = fh
+        self.level = level
+        self.block_size = block_size
+        self.threads = threads or os.cpu_count()
+        self.executor = concurrent.futures.ThreadPoolExecutor(self.threads)
+        self.pending = collections.deque()
+        self.buffer = []
+        self.buffered = 0
+
+    def _compress(self, block):
+        # wbits=31 makes zlib write gzip header and trailer (with zero mtime, so the output is reproducible)
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, 31)
+        return compressor.compress(block) + compressor.flush()
+
+    def _submit(self):
+        self.pending.append(self.executor.submit(self._compress, b"".join(self.buffer)))
+        self.buffer = []
+        self.buffered = 0
+        while len(self.pending) > 2 * self.threads:
+            self.fh.write(self.pending.popleft().result())
+
+    def write(self, data):
+        self.buffer.append(data)
+        self.buffered += len(data)
+        if self.buffered >= self.block_size:
+            self._submit()
+        return len(data)
+
+    def close(self):
+        if self.buffered:
+            self._submit()
+        while self.pending:
+            self.fh.write(self.pending.popleft().result())
+        self.executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            # compressed data is useless after a failure, only the threads are stopped
+            self.executor.shutdown()
+
+
+def compressor(fh, codec="gzip", level=None, threads=None):
+    """
+    Return writer compressing data written to it into `fh` binary file with `codec` ("gzip" or "zstd")
+    at `level` (codec default if None) using `threads` threads (CPU count by default).
+    """
+    level = DEFAULT_LEVELS[codec] if level is None else level
+    if codec == "gzip":
+        return ParallelGzipWriter(fh, level, threads)
+    if zstandard is None:
+        raise RuntimeError("zstd compression requires zstandard package")
+    return zstandard.ZstdCompressor(level=level, threads=threads or os.cpu_count()).stream_writer(fh, closefd=False)
+
+
+def dump(database, fh, codec="gzip", level=None, threads=None):
+    """
+    Write SQL text dump of `database` (the same as `sqlite3 <database> .dump` gives) compressed with `codec` to `fh`
+    binary file. The database is opened read-only and dumped inside a single read transaction, so the dump is
+    a consistent snapshot even while other connections write to a WAL database. It returns number of dumped bytes
+    (before compression).
+    """
+    connection = sqlite3.connect(pathlib.Path(database).resolve().as_uri() + "?mode=ro", uri=True)
+    dumped = 0
+    try:
+        # the snapshot is taken by the first read of the transaction
+        connection.execute("BEGIN")
+        connection.execute("SELECT count(*) FROM sqlite_master").fetchone()
+        with compressor(fh, codec, level, threads) as writer:
+            for line in connection.iterdump():
+                dumped += writer.write(f"{line}\n".encode())
+        connection.rollback()
+    finally:
+        connection.close()
+    return dumped
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dump SQLite database to compressed SQL text file")
+    parser.add_argument("database")
+    parser.add_argument("output")
+    parser.add_argument("--codec", choices=sorted(DEFAULT_LEVELS), default="gzip")
+    parser.add_argument("--level", type=int, help="compression level, codec default if not set")
+    parser.add_argument("--threads", type=int, help="compression threads, CPU count by default")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    with open(args.output, "wb") as fh:
+        dumped = dump(args.database, fh, args.codec, args.level, args.threads)
+    elapsed = time.perf_counter() - started
+    logging.info(
+        f"Dumped {dumped / 1024 ** 2:.1f} MiB of {args.database} to {args.output} "
+        f"({os.path.getsize(args.output) / 1024 ** 2:.1f} MiB) in {elapsed:.2f}s"
+    )
+
+
+if __name__ == '__main__':
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(message)s',
+    )
+
+    main()
@@ -0,0 +1,325 @@
+import argparse
+import concurrent.futures
+import itertools
+import json
+import logging
+import operator
+import os
+import pathlib
+import sqlite3
+import time
+
+import numpy
+
+import loader
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+# rowid range exported to a single chunk file
+CHUNK_ROWS = 100_000
+FORMATS = ["npz", "parquet"]
+MANIFEST_NAME = "manifest.json"
+# text values of a column are stored as a single UTF-8 buffer joined with this separator,
+# or with offsets if some value contains it
+TEXT_SEPARATOR = "\x00"
+# value types of "mixed" columns, values are stored as text: repr() of numbers, hex of blobs
+MIXED_TYPES = [type(None), int, float, str, bytes]
+# text column is dictionary-encoded (distinct values plus per-row codes) when it has less distinct values per row
+DICTIONARY_RATIO = 0.5
+
+
+def connect_read_only(database):
+    return sqlite3.connect(pathlib.Path(database).resolve().as_uri() + "?mode=ro", uri=True)
+
+
+def rowid_ranges(connection, table, chunk_rows=CHUNK_ROWS):
+    """
+    Split rowids of `table` into inclusive (start, end) ranges of `chunk_rows` rowids.
+    Deleted rows leave gaps, so chunks may have less rows. Tables WITHOUT ROWID are not supported.
+    """
+    low, high = connection.execute(f"SELECT min(rowid), max(rowid) FROM {loader.quote_identifier(table)}").fetchone()
+    if low is None:
+        return []
+    return [(start, min(start + chunk_rows - 1, high)) for start in range(low, high + 1, chunk_rows)]
+
+
+def column_kind(values):
+    """
+    Infer storage kind of column `values`: "null", "int", "float", "blob", "text",
+    or "mixed" (SQLite columns may keep values of different types). Columns mixing int and float values are "mixed",
+    float64 would round ints above 2 ** 53 and turn the rest into floats.
+    """
+    types = set(map(type, values)) - {type(None)}
+    if not types:
+        return "null"
+    if types == {int}:
+        return "int"
+    if types == {float}:
+        return "float"
+    if types == {bytes}:
+        return "blob"
+    if types == {str}:
+        return "text"
+    return "mixed"
+
+
+def _mixed_text(value):
+    if isinstance(value, bytes):
+        return value.hex()
+    if isinstance(value, str):
+        return value
+    return "" if value is None else repr(value)
+
+
+def _mixed_value(text, type_code):
+    value_type = MIXED_TYPES[type_code]
+    if value_type is bytes:
+        return bytes.fromhex(text)
+    if value_type is str:
+        return text
+    return None if value_type is type(None) else value_type(text)
+
+
+def encode_column(values):
+    """
+    Return (kind, arrays) compact numpy representation of column `values`, None values are kept in "mask" array.
+    """
+    kind = column_kind(values)
+    arrays = {"mask": numpy.fromiter(map(operator.is_, values, itertools.repeat(None)), bool, len(values))}
+    if kind == "int":
+        integers = numpy.array([0 if value is None else value for value in values], dtype=numpy.int64)
+        # ascending keys (like rowids) are stored as small differences, which compress to almost nothing
+        if len(values) > 1 and (integers[1:] >= integers[:-1]).all() and int(integers[-1]) - int(integers[0]) < 2 ** 63:
+            arrays["deltas"] = numpy.diff(integers, prepend=0)
+        else:
+            arrays["values"] = integers
+    elif kind == "float":
+        arrays["values"] = numpy.array([numpy.nan if value is None else value for value in values], dtype=numpy.float64)
+    elif kind == "blob":
+        values = [b"" if value is None else value for value in values]
+        arrays["values"] = numpy.frombuffer(b"".join(values), dtype=numpy.uint8)
+        arrays["offsets"] = numpy.cumsum([0] + [len(value) for value in values], dtype=numpy.int64)
+    elif kind in ("text", "mixed"):
+        if kind == "mixed":
+            arrays["types"] = numpy.array([MIXED_TYPES.index(type(value)) for value in values], dtype=numpy.uint8)
+            values = [_mixed_text(value) for value in values]
+        if arrays["mask"].any():
+            values = ["" if value is None else value for value in values]
+        if kind == "text":
+            distinct = {}
+            codes = [distinct.setdefault(value, len(distinct)) for value in values]
+            if len(distinct) <= len(values) * DICTIONARY_RATIO:
+                arrays["codes"] = numpy.array(codes, dtype=numpy.min_scalar_type(len(distinct)))
+                values = list(distinct)
+        text = TEXT_SEPARATOR.join(values)
+        if text.count(TEXT_SEPARATOR) != len(values) - 1:
+            # offsets in characters of the joined text, separator is not used
+            text = "".join(values)
+            arrays["offsets"] = numpy.cumsum([0] + [len(value) for value in values], dtype=numpy.int64)
+        arrays["values"] = numpy.frombuffer(text.encode(), dtype=numpy.uint8)
+    return kind, arrays
+
+
+def decode_column(kind, arrays, rows):
+    """
+    Reverse `encode_column()`, return list of `rows` column values.
+    """
+    if kind == "null":
+        return [None] * rows
+    if "deltas" in arrays:
+        values = numpy.cumsum(arrays["deltas"]).tolist()
+    elif kind in ("int", "float"):
+        values = arrays["values"].tolist()
+    elif kind == "blob":
+        data, offsets = arrays["values"].tobytes(), arrays["offsets"].tolist()
+        values = [data[start:end] for start, end in zip(offsets, offsets[1:])]
+    elif "offsets" in arrays:
+        text, offsets = arrays["values"].tobytes().decode(), arrays["offsets"].tolist()
+        values = [text[start:end] for start, end in zip(offsets, offsets[1:])]
+    else:
+        values = arrays["values"].tobytes().decode().split(TEXT_SEPARATOR) if rows else []
+    if "codes" in arrays:
+        values = numpy.array(values, dtype=object)[arrays["codes"]].tolist()
+    if kind == "mixed":
+        values = [_mixed_value(text, type_code) for text, type_code in zip(values, arrays["types"].tolist())]
+    for row in numpy.flatnonzero(arrays["mask"]).tolist():
+        values[row] = None
+    return values
+
+
+def export_chunk(database, table, columns, start, end, path, file_format):
+    """
+    Export rows of `table` with rowid in [start, end] range to `path` columnar file, return manifest entry of the chunk.
+    Every chunk is read by its own read-only connection, so chunks are exported in parallel.
+    """
+    connection = connect_read_only(database)
+    try:
+        rows = connection.execute(
+            f"SELECT {', '.join(map(loader.quote_identifier, columns))} FROM {loader.quote_identifier(table)} "
+            f"WHERE rowid BETWEEN ? AND ? ORDER BY rowid",
+            (start, end),
+        ).fetchall()
+    finally:
+        connection.close()
+
+    column_values = [list(values) for values in zip(*rows)] if rows else [[] for _ in columns]
+    if file_format == "parquet":
+        data = {}
+        for name, values in zip(columns, column_values):
+            # Parquet columns have a single type
+            if column_kind(values) == "mixed":
+                values = [value if value is None else str(value) for value in values]
+            data[name] = values
+        pyarrow.parquet.write_table(pyarrow.table(data), path, compression="zstd")
+        return {"file": os.path.basename(path), "rows": len(rows), "start": start, "end": end}
+
+    kinds, arrays = [], {}
+    for index, values in enumerate(column_values):
+        kind, column_arrays = encode_column(values)
+        kinds.append(kind)
+        arrays.update({f"{index}_{name}": array for name, array in column_arrays.items()})
+    with open(path, "wb") as fh:
+        numpy.savez_compressed(fh, **arrays)
+    return {"file": os.path.basename(path), "rows": len(rows), "start": start, "end": end, "kinds": kinds}
+
+
+def export(database, table, output_dir, file_format="npz", chunk_rows=CHUNK_ROWS, workers=None):
+    """
+    Export `table` of `database` to `output_dir` as columnar chunk files (compressed numpy `.npz`, or Parquet
+    when pyarrow is installed) written by up to `workers` processes, plus `MANIFEST_NAME` JSON file describing
+    the table schema and the chunks. It returns the manifest.
+    """
+    if file_format == "parquet" and pyarrow is None:
+        raise RuntimeError("Parquet export requires pyarrow package")
+    os.makedirs(output_dir, exist_ok=True)
+
+    connection = connect_read_only(database)
+    try:
+        schema = connection.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+        ).fetchone()
+        if schema is None:
+            raise ValueError(f"There is no {table} table in {database}")
+        columns = [row[1] for row in connection.execute(f"PRAGMA table_info({loader.quote_identifier(table)})")]
+        ranges = rowid_ranges(connection, table, chunk_rows)
+    finally:
+        connection.close()
+
+    paths = [os.path.join(output_dir, f"{table}.{index:06d}.{file_format}") for index in range(len(ranges))]
+    workers = min(workers or os.cpu_count(), max(len(ranges), 1))
+    if workers == 1:
+        chunks = [
+            export_chunk(database, table, columns, start, end, path, file_format)
+            for (start, end), path in zip(ranges, paths)
+        ]
+    else:
+        with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+            chunks = list(executor.map(
+                export_chunk,
+                *zip(*[(database, table, columns, start, end, path, file_format) for (start, end), path in zip(ranges, paths)])
+            ))
+
+    manifest = {"table": table, "schema": schema[0], "columns": columns, "format": file_format, "chunks": chunks}
+    with open(os.path.join(output_dir, MANIFEST_NAME), "w") as fh:
+        json.dump(manifest, fh, indent=2)
+    return manifest
+
+
+def read_chunk(input_dir, manifest, chunk):
+    """
+    Return rows (tuples of column values) of exported `chunk`.
+    """
+    path = os.path.join(input_dir, chunk["file"])
+    if manifest["format"] == "parquet":
+        columns = [column.to_pylist() for column in pyarrow.parquet.read_table(path).columns]
+    else:
+        with numpy.load(path) as npz:
+            columns = [
+                decode_column(
+                    kind,
+                    {name.split("_", 1)[1]: npz[name] for name in npz.files if name.split("_", 1)[0] == str(index)},
+                    chunk["rows"],
+                )
+                for index, kind in enumerate(chunk["kinds"])
+            ]
+    return list(zip(*columns))
+
+
+def restore(input_dir, database, workers=None):
+    """
+    Load table exported by `export()` from `input_dir` into `database`, the table is created if it does not exist.
+    Chunk files are read and decompressed by a pool of up to `workers` threads (decompression releases the GIL),
+    rows are inserted with `executemany()` in a single transaction. It returns number of restored rows.
+    """
+    with open(os.path.join(input_dir, MANIFEST_NAME)) as fh:
+        manifest = json.load(fh)
+    if manifest["format"] == "parquet" and pyarrow is None:
+        raise RuntimeError("Parquet restore requires pyarrow package")
+
+    query = (
+        f"INSERT INTO {loader.quote_identifier(manifest['table'])} "
+        f"({', '.join(map(loader.quote_identifier, manifest['columns']))}) "
+        f"VALUES ({', '.join('?' * len(manifest['columns']))})"
+    )
+    connection = sqlite3.connect(database)
+    restored = 0
+    try:
+        with connection, concurrent.futures.ThreadPoolExecutor(workers or os.cpu_count()) as executor:
+            connection.execute("BEGIN")
+            exists = connection.execute(
+                "SELECT count(*) FROM sqlite_master WHERE type = 'table' AND name = ?", (manifest["table"],)
+            ).fetchone()[0]
+            if not exists:
+                connection.execute(manifest["schema"])
+            # chunks are decoded ahead by the pool while the previous ones are inserted
+            for rows in executor.map(lambda chunk: read_chunk(input_dir, manifest, chunk), manifest["chunks"]):
+                connection.executemany(query, rows)
+                restored += len(rows)
+                logging.debug(f"Restored rows count - {restored}")
+    finally:
+        connection.close()
+    return restored
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export SQLite table to columnar chunk files and restore it back")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export")
+    export_parser.add_argument("database")
+    export_parser.add_argument("output_dir")
+    export_parser.add_argument("--table", default="employees")
+    export_parser.add_argument("--format", choices=FORMATS, default="npz")
+    export_parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    export_parser.add_argument("--workers", type=int, help="export processes, CPU count by default")
+
+    restore_parser = subparsers.add_parser("restore")
+    restore_parser.add_argument("input_dir")
+    restore_parser.add_argument("database")
+    restore_parser.add_argument("--workers", type=int, help="chunk reading threads, CPU count by default")
+
+    args = parser.parse_args()
+    started = time.perf_counter()
+    if args.command == "export":
+        manifest = export(args.database, args.table, args.output_dir, args.format, args.chunk_rows, args.workers)
+        logging.info(
+            f"Exported {sum(chunk['rows'] for chunk in manifest['chunks'])} rows of {args.table} "
+            f"to {len(manifest['chunks'])} chunks in {time.perf_counter() - started:.2f}s"
+        )
+    else:
+        rows = restore(args.input_dir, args.database, args.workers)
+        logging.info(f"Restored {rows} rows in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == '__main__':
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(message)s',
+    )
+
+    main()
@@ -0,0 +1,107 @@
+import argparse
+import csv
+import itertools
+import logging
+import operator
+import sqlite3
+import time
+
+
+# rows sent to the database by a single `executemany()` call
+BATCH_SIZE = 10000
+
+# PRAGMAs applied before the load. `journal_mode=WAL` is persistent (it is stored in the database file),
+# `synchronous=OFF` trades durability of the load for speed: power loss during it may corrupt the database
+LOAD_PROFILES = {
+    "default": [],
+    "wal": ["PRAGMA journal_mode=WAL", "PRAGMA synchronous=NORMAL"],
+    "fast": ["PRAGMA journal_mode=WAL", "PRAGMA synchronous=OFF", "PRAGMA temp_store=MEMORY", "PRAGMA cache_size=-262144"],
+}
+
+
+def quote_identifier(name):
+    """
+    Quote table or column name for SQL query, names come from the CSV header and can not be passed as parameters.
+    """
+    return '"' + name.replace('"', '""') + '"'
+
+
+def table_indexes(connection, table):
+    """
+    Return list of (name, sql) of explicitly created indexes of `table` (automatic ones can not be dropped).
+    """
+    return connection.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL", (table,)
+    ).fetchall()
+
+
+def load(connection, table, csv_reader, batch_size=BATCH_SIZE, profile="default", defer_indexes=False):
+    """
+    Insert rows of `csv_reader` (`csv.DictReader`) into `table` with parametrized `executemany()` calls of `batch_size` rows.
+    All the rows are inserted in a single transaction, so the whole load is committed (and synced to disk) once,
+    or rolled back on error. `profile` is one of `LOAD_PROFILES`. With `defer_indexes` indexes of `table` are dropped
+    before the load and created again after it, building an index at once is faster than updating it row by row.
+    It returns number of inserted rows.
+    """
+    fieldnames = csv_reader.fieldnames
+    query = (
+        f"INSERT INTO {quote_identifier(table)} ({', '.join(map(quote_identifier, fieldnames))}) "
+        f"VALUES ({', '.join('?' * len(fieldnames))})"
+    )
+    # itemgetter returns a scalar for a single field
+    values = operator.itemgetter(*fieldnames) if len(fieldnames) > 1 else lambda row: (row[fieldnames[0]],)
+
+    # PRAGMAs changing the journal can not be run inside a transaction
+    connection.commit()
+    for pragma in LOAD_PROFILES[profile]:
+        connection.execute(pragma)
+
+    started = time.perf_counter()
+    rows = map(values, csv_reader)
+    inserted = 0
+    with connection:
+        # explicit transaction, otherwise DDL statements below would be committed right away
+        connection.execute("BEGIN")
+        indexes = table_indexes(connection, table) if defer_indexes else []
+        for name, _ in indexes:
+            connection.execute(f"DROP INDEX {quote_identifier(name)}")
+
+        for batch in iter(lambda: list(itertools.islice(rows, batch_size)), []):
+            connection.executemany(query, batch)
+            inserted += len(batch)
+            logging.debug(f"Inserted rows count - {inserted}")
+
+        for name, sql in indexes:
+            logging.debug(f"Creating index {name}")
+            connection.execute(sql)
+    elapsed = time.perf_counter() - started
+
+    logging.info(f"Loaded {inserted} rows into {table} in {elapsed:.2f}s, {inserted / max(elapsed, 1e-9):.0f} rows/s")
+    return inserted
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk load CSV file into SQLite table")
+    parser.add_argument("csv_file")
+    parser.add_argument("database")
+    parser.add_argument("--table", default="employees")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--profile", choices=sorted(LOAD_PROFILES), default="default")
+    parser.add_argument("--defer-indexes", action="store_true", help="drop table indexes for the load and create them after")
+    args = parser.parse_args()
+
+    connection = sqlite3.connect(args.database)
+    try:
+        with open(args.csv_file, newline="") as fh:
+            load(connection, args.table, csv.DictReader(fh), args.batch_size, args.profile, args.defer_indexes)
+    finally:
+        connection.close()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(message)s',
+    )
+
+    main()
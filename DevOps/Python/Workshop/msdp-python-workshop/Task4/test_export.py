@@ -0,0 +1,47 @@
+import sqlite3
+
+import export
+
+
+ROWS = [
+    (1, 2 ** 60 + 1, "alpha", b"\x00\x01"),
+    (2, 0.5, "beta", None),
+    (3, None, "alpha", b""),
+    (4, -(2 ** 63), None, b"\xff"),
+    (5, 7, "gamma\x00delta", b"\x02"),
+]
+
+
+def create(path, rows):
+    connection = sqlite3.connect(path)
+    with connection:
+        connection.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, amount, name TEXT, data BLOB)")
+        connection.executemany("INSERT INTO items VALUES (?, ?, ?, ?)", rows)
+    connection.close()
+
+
+def select(path):
+    connection = sqlite3.connect(path)
+    try:
+        return connection.execute("SELECT id, amount, typeof(amount), name, data FROM items ORDER BY id").fetchall()
+    finally:
+        connection.close()
+
+
+def test_column_kind_keeps_ints_mixed_with_floats():
+    assert export.column_kind([1, None, 2]) == "int"
+    assert export.column_kind([0.5, None]) == "float"
+    assert export.column_kind([2 ** 60 + 1, 0.5]) == "mixed"
+
+
+def test_export_restore_round_trip(tmp_path):
+    source, restored = str(tmp_path / "source.sqlite"), str(tmp_path / "restored.sqlite")
+    create(source, ROWS)
+
+    manifest = export.export(source, "items", str(tmp_path / "export"), chunk_rows=2, workers=1)
+    assert [chunk["rows"] for chunk in manifest["chunks"]] == [2, 2, 1]
+    assert export.restore(str(tmp_path / "export"), restored, workers=1) == len(ROWS)
+
+    rows = select(restored)
+    assert rows == select(source)
+    assert rows[0][1] == 2 ** 60 + 1 and rows[0][2] == "integer"
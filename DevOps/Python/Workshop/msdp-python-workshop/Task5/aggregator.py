@@ -0,0 +1,187 @@
+import aiohttp
+import argparse
+import asyncio
+import heapq
+import logging
+import re
+import time
+
+import prometheus_client
+from prometheus_client.core import GaugeMetricFamily
+
+import collector
+
+
+AGGREGATOR_PORT = 9998
+SCRAPE_INTERVAL = 3
+# requests in flight, all the targets are scraped from a single thread
+CONCURRENCY = 50
+# seconds for the whole request of a target
+TIMEOUT = 2
+TOP = 20
+# last good samples of a failing target are used for this many intervals
+STALE_INTERVALS = 5
+LABEL_REGEXP = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+ESCAPE_REGEXP = re.compile(r"\\(.)")
+
+
+def target_url(target):
+    return target if "://" in target else f"http://{target}/metrics"
+
+
+def unescape(value):
+    return ESCAPE_REGEXP.sub(lambda match: "\n" if match.group(1) == "n" else match.group(1), value)
+
+
+def parse_sample(line, metric=collector.METRIC_NAME):
+    """
+    Return labels and value of `metric` sample from text exposition format `line`, None for other lines.
+    """
+    if not line.startswith(metric):
+        return None
+    rest = line[len(metric):]
+    if rest.startswith("{"):
+        end = rest.rindex("}")
+        labels = {name: unescape(value) for name, value in LABEL_REGEXP.findall(rest, 1, end)}
+        rest = rest[end + 1:]
+    elif rest.startswith(" "):
+        labels = {}
+    else:
+        # another metric with the same prefix
+        return None
+    return labels, float(rest.split()[0])
+
+
+class Target(object):
+    def __init__(self, url):
+        self.url = url
+        # (value, labels) of the target processes with the most CPU time
+        self.samples = []
+        self.updated = None
+        self.up = False
+
+
+class Aggregator(object):
+    """
+    Scrapes `cpu_time` of many exporters concurrently with asyncio and keeps `top` processes with the most
+    CPU time across all of them. It is a `prometheus_client` collector of that view.
+    """
+    def __init__(self, targets, top=TOP, interval=SCRAPE_INTERVAL, concurrency=CONCURRENCY, timeout=TIMEOUT):
+        self.targets = [Target(target_url(target)) for target in targets]
+        self.top_count = top
+        self.interval = interval
+        self.concurrency = concurrency
+        self.timeout = timeout
+        # (value, target url, labels), replaced as a whole so scrapes of the aggregator see a consistent view
+        self.top = []
+
+    async def scrape(self, session, semaphore, target):
+        async with semaphore:
+            try:
+                samples = []
+                async with session.get(target.url) as response:
+                    response.raise_for_status()
+                    # samples are parsed line by line as they arrive, the payload is not kept
+                    async for line in response.content:
+                        sample = parse_sample(line.decode())
+                        if sample is not None:
+                            samples.append(sample)
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as err:
+                if target.up:
+                    logging.warning(f"Failed to scrape {target.url}: {err!r}")
+                target.up = False
+                return
+        # only the target top can get to the overall top
+        target.samples = heapq.nlargest(
+            self.top_count, ((value, labels) for labels, value in samples), key=lambda sample: sample[0]
+        )
+        target.updated = time.monotonic()
+        target.up = True
+
+    def merge(self):
+        now = time.monotonic()
+        stale_after = self.interval * STALE_INTERVALS
+        self.top = heapq.nlargest(
+            self.top_count,
+            (
+                (value, target.url, labels)
+                for target in self.targets
+                if target.up or target.updated is not None and now - target.updated <= stale_after
+                for value, labels in target.samples
+            ),
+            key=lambda sample: sample[0],
+        )
+
+    async def scrape_all(self, session, semaphore):
+        started = time.perf_counter()
+        await asyncio.gather(*(self.scrape(session, semaphore, target) for target in self.targets))
+        self.merge()
+        logging.debug(
+            f"scraped {sum(target.up for target in self.targets)} of {len(self.targets)} targets "
+            f"in {time.perf_counter() - started:.2f}s"
+        )
+
+    async def run(self, rounds=None):
+        """
+        Scrape all the targets every `interval` seconds, `rounds` times or forever.
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        connector = aiohttp.TCPConnector(limit=self.concurrency)
+        async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+            completed = 0
+            while True:
+                started = time.monotonic()
+                await self.scrape_all(session, semaphore)
+                completed += 1
+                if rounds is not None and completed >= rounds:
+                    break
+                await asyncio.sleep(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def describe(self):
+        return []
+
+    def collect(self):
+        top = self.top
+        cpu_time = GaugeMetricFamily(
+            "fleet_cpu_time", "CPU consumption time of the top processes across all the targets",
+            labels=["target", "id", "cmd"],
+        )
+        for value, url, labels in top:
+            cpu_time.add_metric([url, labels.get("id", ""), labels.get("cmd", "")], value)
+        yield cpu_time
+
+        up = GaugeMetricFamily("fleet_target_up", "Whether the last scrape of the target succeeded", labels=["target"])
+        for target in self.targets:
+            up.add_metric([target.url], float(target.up))
+        yield up
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Aggregate top CPU processes of many exporters")
+    parser.add_argument("targets", nargs="+", help="exporter URLs or host:port")
+    parser.add_argument("--port", type=int, default=AGGREGATOR_PORT)
+    parser.add_argument("--interval", type=float, default=SCRAPE_INTERVAL)
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY)
+    parser.add_argument("--timeout", type=float, default=TIMEOUT)
+    parser.add_argument("--top", type=int, default=TOP)
+    args = parser.parse_args()
+
+    aggregator = Aggregator(args.targets, args.top, args.interval, args.concurrency, args.timeout)
+    registry = prometheus_client.CollectorRegistry()
+    registry.register(aggregator)
+    prometheus_client.start_http_server(args.port, registry=registry)
+    logging.info(f"Aggregator of {len(aggregator.targets)} targets started at http://127.0.0.1:{args.port}")
+    try:
+        asyncio.run(aggregator.run())
+    except KeyboardInterrupt:
+        logging.info("Stopped")
+
+
+if __name__ == '__main__':
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(message)s',
+    )
+
+    main()
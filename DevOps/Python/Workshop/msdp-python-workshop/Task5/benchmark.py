@@ -0,0 +1,214 @@
+import aggregator
+import argparse
+import asyncio
+import logging
+import os
+import signal
+import statistics
+import subprocess
+import time
+import urllib.request
+
+import prometheus_client
+import psutil
+
+import collector
+import sampler
+
+
+def process_iter_sample(names=sampler.PROCESS_NAMES):
+    """
+    Reference implementation: all the attributes of every process are read, then filtered by name.
+    """
+    return [
+        proc.info for proc in psutil.process_iter(attrs=['pid', 'name', 'cmdline', 'cpu_times'])
+        if any(name in proc.info['name'].lower() for name in names)
+    ]
+
+
+def spawn(count, matching_every):
+    """
+    Start `count` sleeping processes, every `matching_every`-th of them is bash to be sampled.
+    """
+    procs = []
+    for index in range(count):
+        if matching_every and index % matching_every == 0:
+            args = ["bash", "-c", "sleep 3600; :"]
+        else:
+            args = ["sleep", "3600"]
+        # a session per process, so `stop()` kills sleep of bash as well and nothing keeps our stdout open
+        procs.append(subprocess.Popen(
+            args, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True
+        ))
+    return procs
+
+
+def stop(procs):
+    for proc in procs:
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+    for proc in procs:
+        proc.wait()
+
+
+def measure(function, scrapes):
+    timings = []
+    for _ in range(scrapes):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    # the first sampler scrape reads all the names, the steady state ones are reported separately
+    return timings[0], statistics.median(timings[1:])
+
+
+def benchmark_scrape(args):
+    procs = []
+    try:
+        for count in sorted(args.processes):
+            procs += spawn(count - len(procs), args.matching_every)
+            total = len(psutil.pids())
+            _, baseline = measure(process_iter_sample, args.scrapes)
+            first, steady = measure(sampler.ProcessSampler().sample, args.scrapes)
+            logging.info(
+                f"{total} processes: process_iter {baseline * 1000:.1f}ms per scrape, "
+                f"ProcessSampler {steady * 1000:.1f}ms per scrape (first scrape {first * 1000:.1f}ms)"
+            )
+    finally:
+        stop(procs)
+
+
+class FakeCpuTimes(object):
+    def __init__(self, user, system):
+        self.user = user
+        self.system = system
+
+
+def churning_processes(alive, replaced):
+    """
+    Return function giving `alive` fake processes per call, `replaced` of them get new PIDs on each call.
+    """
+    state = {"cycle": 0}
+
+    def sample():
+        cycle = state["cycle"]
+        state["cycle"] += 1
+        return [
+            {
+                "pid": pid, "name": "python3", "cmdline": ["python3", "-m", "worker", f"--job={pid}", "x" * 300],
+                "cpu_times": FakeCpuTimes(cycle * 0.1, 0.01),
+            }
+            for pid in range(cycle * replaced, cycle * replaced + alive)
+        ]
+    return sample
+
+
+def gauge_registry(sample):
+    """
+    Reference implementation: `Gauge` updated after each sample, series are never removed.
+    """
+    registry = prometheus_client.CollectorRegistry()
+    cpu_time = prometheus_client.Gauge(
+        collector.METRIC_NAME, collector.METRIC_DOCUMENTATION, ["id", "cmd"], registry=registry
+    )
+
+    def update():
+        for proc in sample():
+            cpu_time.labels(
+                id=f"{proc['name']}_{proc['pid']}", cmd=" ".join(proc['cmdline'])
+            ).set(proc['cpu_times'].system + proc['cpu_times'].user)
+    return registry, update
+
+
+def collector_registry(sample, max_series):
+    registry = prometheus_client.CollectorRegistry()
+    registry.register(collector.ProcessCollector(sample, max_series))
+    return registry, lambda: None
+
+
+def benchmark_churn(args):
+    registries = {
+        "Gauge": gauge_registry(churning_processes(args.alive, args.replaced)),
+        "ProcessCollector": collector_registry(churning_processes(args.alive, args.replaced), args.max_series),
+    }
+    for name, (registry, update) in registries.items():
+        for cycle in range(1, args.cycles + 1):
+            update()
+            payload = prometheus_client.generate_latest(registry)
+            if cycle in (1, args.cycles) or cycle % args.report_every == 0:
+                series = payload.count(b"\n" + collector.METRIC_NAME.encode() + b"{")
+                logging.info(f"{name} cycle {cycle}: {series} series, {len(payload) / 1024:.0f} KiB scrape")
+
+
+def benchmark_fleet(args):
+    targets = []
+    for index in range(args.exporters):
+        registry = prometheus_client.CollectorRegistry()
+        registry.register(collector.ProcessCollector(churning_processes(args.alive, args.replaced)))
+        prometheus_client.start_http_server(args.base_port + index, addr="127.0.0.1", registry=registry)
+        targets.append(f"127.0.0.1:{args.base_port + index}")
+    # nothing listens there, the aggregator has to keep going without them
+    targets += [f"127.0.0.1:{args.base_port + args.exporters + index}" for index in range(args.dead)]
+
+    fleet = aggregator.Aggregator(targets, args.top, interval=0, concurrency=args.concurrency)
+    registry = prometheus_client.CollectorRegistry()
+    registry.register(fleet)
+    prometheus_client.start_http_server(args.port, addr="127.0.0.1", registry=registry)
+
+    started = time.perf_counter()
+    asyncio.run(fleet.run(args.rounds))
+    elapsed = time.perf_counter() - started
+    with urllib.request.urlopen(f"http://127.0.0.1:{args.port}/metrics") as response:
+        payload = response.read()
+    logging.info(
+        f"{args.exporters} exporters of {args.alive} processes and {args.dead} dead targets: "
+        f"{elapsed / args.rounds * 1000:.0f}ms per round, {sum(target.up for target in fleet.targets)} up, "
+        f"aggregated scrape {payload.count(b'fleet_cpu_time{')} top series, {len(payload) / 1024:.0f} KiB"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Task5 benchmarks")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    scrape_parser = subparsers.add_parser("scrape", help="process_iter against the incremental process sampler")
+    scrape_parser.add_argument(
+        "--processes", type=int, nargs="+", default=[100, 1000, 3000],
+        help="sleeping processes to start before each measurement"
+    )
+    scrape_parser.add_argument("--matching-every", type=int, default=50, help="every N-th started process is bash")
+    scrape_parser.add_argument("--scrapes", type=int, default=10)
+    scrape_parser.set_defaults(func=benchmark_scrape)
+
+    churn_parser = subparsers.add_parser("churn", help="scrape size of Gauge against collector with short-lived processes")
+    churn_parser.add_argument("--alive", type=int, default=700, help="processes alive at each scrape")
+    churn_parser.add_argument("--replaced", type=int, default=50, help="processes replaced between scrapes")
+    churn_parser.add_argument("--max-series", type=int, default=collector.MAX_SERIES)
+    churn_parser.add_argument("--cycles", type=int, default=200)
+    churn_parser.add_argument("--report-every", type=int, default=50)
+    churn_parser.set_defaults(func=benchmark_churn)
+
+    fleet_parser = subparsers.add_parser("fleet", help="async aggregator over many local exporters")
+    fleet_parser.add_argument("--exporters", type=int, default=100)
+    fleet_parser.add_argument("--dead", type=int, default=5, help="targets without exporter")
+    fleet_parser.add_argument("--alive", type=int, default=50, help="processes of each exporter")
+    fleet_parser.add_argument("--replaced", type=int, default=5, help="processes replaced between scrapes")
+    fleet_parser.add_argument("--base-port", type=int, default=19000)
+    fleet_parser.add_argument("--port", type=int, default=aggregator.AGGREGATOR_PORT)
+    fleet_parser.add_argument("--concurrency", type=int, default=aggregator.CONCURRENCY)
+    fleet_parser.add_argument("--top", type=int, default=aggregator.TOP)
+    fleet_parser.add_argument("--rounds", type=int, default=5)
+    fleet_parser.set_defaults(func=benchmark_fleet)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(message)s',
+    )
+
+    main()
@@ -5,6 +5,8 @@ import prometheus_client
 import subprocess
 import time
 import contextlib
+import sampler
+import collector
 
 
 BUCLE_FILE = "./bucle.sh"
@@ -12,6 +14,9 @@ BUCLE_FILE = "./bucle.sh"
 PROMETHEUS_PORT = 9999
 UPDATE_PERIOD   = 3
 
+# keeps `psutil.Process` objects between `processes()` calls
+SAMPLER = sampler.ProcessSampler()
+
 
 def bucle_launch():
     """
@@ -56,6 +61,9 @@ def processes():
     # for all running processes
         # when it is python or bash process
             # add process info to `proc_objects`
+    # the sampler reads names of new processes only and `labels` of the python and bash ones,
+    # `psutil.process_iter(attrs=labels)` reads all of them for every process on each call
+    proc_objects = SAMPLER.sample()
     ### Block implemented by student
 
     return proc_objects
@@ -65,9 +73,10 @@ def main():
     prometheus_client.start_http_server(PROMETHEUS_PORT)
     logging.info(f"Prometheus exporter started at http://127.0.0.1:{PROMETHEUS_PORT}")
 
-    CPU_TIME = prometheus_client.Gauge('cpu_time',
-                                       'Hold current process CPU consumption time',
-                                       ['id', 'cmd'])
+    # processes are sampled when the endpoint is scraped instead of a `Gauge` updated in the loop,
+    # series of dead processes are not exported anymore and the number of series is capped
+    CPU_TIME = collector.ProcessCollector(processes)
+    prometheus_client.REGISTRY.register(CPU_TIME)
 
     for counter in range(10):
         """
@@ -82,11 +91,10 @@ def main():
                 2. Sleep for UPDATE_PERIOD
                 3. Perform HTTP GET request to Prometheus endpoint and print its content to stdout.
         """
-        for proc in processes():
-            pass
-            ### Block implemented by student
-            # set labeled cpu times value in `CPU_TIME`
-            ### Block implemented by student
+        ### Block implemented by student
+        # set labeled cpu times value in `CPU_TIME`
+        # `CPU_TIME` collector sets them on scrape
+        ### Block implemented by student
         ### Block implemented by student
         # sleep for an `UPDATE_PERIOD`
         # log HTTP Get request result to Prometheus endpoint
@@ -0,0 +1,60 @@
+import hashlib
+import threading
+
+from prometheus_client.core import GaugeMetricFamily
+
+
+METRIC_NAME = "cpu_time"
+METRIC_DOCUMENTATION = "Hold current process CPU consumption time"
+# processes exported one by one, the rest is summed up by name
+MAX_SERIES = 500
+# longer command lines are cut and suffixed with a hash of the whole one to stay unique
+CMD_LENGTH = 200
+HASH_LENGTH = 8
+
+
+def cmd_label(cmdline, length=CMD_LENGTH):
+    cmd = " ".join(cmdline)
+    if len(cmd) <= length:
+        return cmd
+    digest = hashlib.sha1(cmd.encode(errors="replace")).hexdigest()[:HASH_LENGTH]
+    return f"{cmd[:length - HASH_LENGTH - 1]}~{digest}"
+
+
+class ProcessCollector(object):
+    """
+    `prometheus_client` collector calling `sample()` (it returns `proc.info` like dicts) on every scrape.
+    Only the processes alive at the scrape are exported, so series of dead processes disappear by themselves.
+    Up to `max_series` processes with the most CPU time get own series, the others are summed by name
+    into "<name>_other" series with empty `cmd`.
+    """
+    def __init__(self, sample, max_series=MAX_SERIES, cmd_length=CMD_LENGTH):
+        self.sample = sample
+        self.max_series = max_series
+        self.cmd_length = cmd_length
+        # the exporter serves scrapes from several threads, samplers keep state between calls
+        self.lock = threading.Lock()
+
+    def describe(self):
+        return [GaugeMetricFamily(METRIC_NAME, METRIC_DOCUMENTATION, labels=["id", "cmd"])]
+
+    def collect(self):
+        with self.lock:
+            procs = self.sample()
+        cpu_time = GaugeMetricFamily(METRIC_NAME, METRIC_DOCUMENTATION, labels=["id", "cmd"])
+        values = [
+            (proc["cpu_times"].system + proc["cpu_times"].user, proc) for proc in procs
+        ]
+        if len(values) > self.max_series:
+            values.sort(key=lambda value: value[0], reverse=True)
+        other = {}
+        for index, (value, proc) in enumerate(values):
+            if index < self.max_series:
+                cpu_time.add_metric(
+                    [f"{proc['name']}_{proc['pid']}", cmd_label(proc["cmdline"], self.cmd_length)], value
+                )
+            else:
+                other[proc["name"]] = other.get(proc["name"], 0) + value
+        for name, value in sorted(other.items()):
+            cpu_time.add_metric([f"{name}_other", ""], value)
+        yield cpu_time
@@ -0,0 +1,80 @@
+import logging
+
+import psutil
+
+
+# processes are kept when one of these is in the lowercased name ("Python", "python3.8", "bash", ...)
+PROCESS_NAMES = ["python", "bash"]
+# full rescan of rejected PIDs, a PID of a rejected process may be reused by a matching one between scrapes
+RESCAN_CYCLES = 60
+SKIPPED_ERRORS = (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess)
+
+
+class ProcessSampler(object):
+    """
+    Incremental replacement of `psutil.process_iter(attrs=['pid', 'name', 'cmdline', 'cpu_times'])` filtered by name.
+
+    `Process` objects of matching PIDs are kept between `sample()` calls with their name and command line,
+    only the names of new PIDs are read (one `/proc/<pid>/stat` read) and rejected PIDs are not read again.
+    Each kept process costs a single `oneshot()` read of its CPU times per sample, vanished PIDs are dropped.
+    """
+    def __init__(self, names=PROCESS_NAMES, rescan_cycles=RESCAN_CYCLES):
+        self.names = [name.lower() for name in names]
+        self.rescan_cycles = rescan_cycles
+        # pid -> (psutil.Process, name, cmdline)
+        self.tracked = {}
+        self.rejected = set()
+        self.cycles = 0
+
+    def matches(self, name):
+        name = name.lower()
+        return any(process_name in name for process_name in self.names)
+
+    def _track(self, pid):
+        try:
+            proc = psutil.Process(pid)
+            name = proc.name()
+            if not self.matches(name):
+                self.rejected.add(pid)
+                return
+            try:
+                cmdline = proc.cmdline()
+            except psutil.AccessDenied:
+                cmdline = []
+        except SKIPPED_ERRORS:
+            return
+        self.tracked[pid] = (proc, name, cmdline)
+
+    def sample(self):
+        """
+        Return list of `proc.info` like dicts with "pid", "name", "cmdline" and "cpu_times" of matching processes.
+        """
+        self.cycles += 1
+        if self.rescan_cycles and self.cycles % self.rescan_cycles == 0:
+            self.rejected.clear()
+
+        pids = set(psutil.pids())
+        for pid in self.tracked.keys() - pids:
+            del self.tracked[pid]
+        self.rejected &= pids
+        for pid in pids - self.tracked.keys() - self.rejected:
+            self._track(pid)
+
+        samples = []
+        for pid, (proc, name, cmdline) in list(self.tracked.items()):
+            try:
+                with proc.oneshot():
+                    cpu_times = proc.cpu_times()
+                    # the status comes from the same cached read, killed but not yet reaped processes are not exported
+                    if proc.status() == psutil.STATUS_ZOMBIE:
+                        continue
+                    # compares the creation time, the PID may belong to another process since the last sample
+                    if not proc.is_running():
+                        raise psutil.NoSuchProcess(pid)
+            except SKIPPED_ERRORS:
+                del self.tracked[pid]
+                # it is looked up again as a new PID on the next sample
+                continue
+            samples.append({"pid": pid, "name": name, "cmdline": cmdline, "cpu_times": cpu_times})
+        logging.debug(f"sampled {len(samples)} of {len(pids)} processes")
+        return samples
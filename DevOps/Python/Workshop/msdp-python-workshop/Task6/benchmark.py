@@ -0,0 +1,224 @@
+import argparse
+import hashlib
+import heapq
+import instrument
+import logging
+import os
+import stream
+import tempfile
+import threading
+import time
+import timeit
+import tracemalloc
+
+
+from hsm import HSM
+from hsm import HSMFactory
+
+
+class VirtualClock(object):
+    """
+    Device clock for `HSM(sleep=...)` which does not sleep: `sleep()` blocks until the virtual `time` reaches
+    the wake up time, the time jumps to the nearest wake up once no thread started or finished a sleep
+    for `settle` real seconds. Sleeps of concurrent calls overlap like requests served by the device at once,
+    so with a fixed `HSM.latency` the elapsed device time does not depend on the machine.
+    """
+    def __init__(self, settle=0.005):
+        self.settle = settle
+        self.time = 0.0
+        self.calls = 0
+        self.wakeups = []
+        # changed by every sleep and time jump, a waiter jumps only if nothing happened while it waited
+        self.generation = 0
+        self.condition = threading.Condition()
+
+    def sleep(self, seconds):
+        with self.condition:
+            self.calls += 1
+            wakeup = self.time + seconds
+            if wakeup <= self.time:
+                return
+            heapq.heappush(self.wakeups, wakeup)
+            self.generation += 1
+            self.condition.notify_all()
+            while self.time < wakeup:
+                generation = self.generation
+                if not self.condition.wait(self.settle) and generation == self.generation:
+                    self._advance()
+
+    def _advance(self):
+        self.time = heapq.heappop(self.wakeups)
+        while self.wakeups and self.wakeups[0] <= self.time:
+            heapq.heappop(self.wakeups)
+        self.generation += 1
+        self.condition.notify_all()
+
+
+def benchmark_batch(args):
+    texts = [f"token-{index % args.distinct}" for index in range(args.items)]
+
+    clock = VirtualClock()
+    hsm = HSM(latency=(args.latency, args.latency), sleep=clock.sleep)
+    tokens = [hsm.encrypt(text) for text in texts]
+    logging.info(f"encrypt one by one: {args.items} items, {clock.calls} device calls, {clock.time:.1f} device seconds")
+
+    for workers in args.workers:
+        clock = VirtualClock()
+        hsm = HSM(latency=(args.latency, args.latency), sleep=clock.sleep)
+        tokens = hsm.encrypt_many(texts, workers)
+        elapsed, calls = clock.time, clock.calls
+        assert not any(isinstance(token, Exception) for token in tokens), "Encryption failed"
+        assert hsm.decrypt_many(tokens, workers) == [text.encode() for text in texts], "Decrypted texts mismatch"
+        logging.info(
+            f"encrypt_many(workers={workers}): {args.items} items, {calls} device calls, {elapsed:.1f} device seconds"
+        )
+
+
+def benchmark_instrument(args):
+    def function(value):
+        return value
+
+    registry = instrument.Registry()
+    wrapped = {
+        "plain call": function,
+        "instrument.time_it": instrument.time_it(function),
+        "instrument, disabled": instrument.Registry(enabled=False).wrap(function),
+        "instrument, enabled": registry.wrap(function),
+    }
+    for name, wrapper in wrapped.items():
+        seconds = min(timeit.repeat(lambda: wrapper(1), number=args.calls, repeat=3))
+        logging.info(f"{name}: {seconds / args.calls * 1e9:.0f}ns per call")
+    logging.info(registry.table())
+
+
+def benchmark_factory(args):
+    keys = [f"{tenant:032d}" for tenant in range(args.tenants)]
+    requests = [keys[index % args.tenants] for index in range(args.requests)]
+
+    started = time.perf_counter()
+    for key in requests:
+        HSM(key)
+    elapsed = time.perf_counter() - started
+    logging.info(f"HSM(key) per request: {elapsed / args.requests * 1e6:.1f}us")
+
+    factory = HSMFactory()
+    started = time.perf_counter()
+    for key in requests:
+        factory.get(key)
+    elapsed = time.perf_counter() - started
+    logging.info(
+        f"HSMFactory.get(key) per request: {elapsed / args.requests * 1e6:.1f}us, "
+        f"{len(factory.handles)} handles cached"
+    )
+    logging.info(factory.timings.table())
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(stream.CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def traced(function):
+    """
+    Return seconds and peak traced memory of `function()` call.
+    """
+    tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        function()
+        return time.perf_counter() - started, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def benchmark_stream(args):
+    hsm = HSM(latency=(0, 0))
+    megabytes = args.size / 1024 / 1024
+    with tempfile.TemporaryDirectory() as directory:
+        plain, encrypted, decrypted = (os.path.join(directory, name) for name in ("plain", "encrypted", "decrypted"))
+        with open(plain, "wb") as file:
+            for _ in range(0, args.size, stream.CHUNK_SIZE):
+                file.write(os.urandom(min(stream.CHUNK_SIZE, args.size - file.tell())))
+        expected = file_digest(plain)
+
+        def fernet():
+            with open(plain, "rb") as file:
+                token = hsm.cipher_suite.encrypt(file.read())
+            hsm.cipher_suite.decrypt(token)
+
+        seconds, peak = traced(fernet)
+        logging.info(
+            f"Fernet whole payload: {megabytes * 2 / seconds:.0f} MB/s encrypt+decrypt, "
+            f"peak memory {peak / 1024 / 1024:.0f} MiB"
+        )
+
+        for workers in args.workers:
+            def encrypt():
+                with open(plain, "rb") as src, open(encrypted, "wb") as dst:
+                    hsm.encrypt_stream(src, dst, args.chunk_size, workers)
+
+            def decrypt():
+                with open(encrypted, "rb") as src, open(decrypted, "wb") as dst:
+                    hsm.decrypt_stream(src, dst, workers)
+
+            encrypt_seconds, encrypt_peak = traced(encrypt)
+            decrypt_seconds, decrypt_peak = traced(decrypt)
+            assert file_digest(decrypted) == expected, "Decrypted stream mismatch"
+            logging.info(
+                f"stream(workers={workers}): encrypt {megabytes / encrypt_seconds:.0f} MB/s, "
+                f"decrypt {megabytes / decrypt_seconds:.0f} MB/s, "
+                f"peak memory {max(encrypt_peak, decrypt_peak) / 1024 / 1024:.0f} MiB, "
+                f"overhead {os.path.getsize(encrypted) - args.size} bytes"
+            )
+
+        chunks = max(1, -(-args.size // args.chunk_size))
+        with open(plain, "rb") as file, open(encrypted, "rb") as src:
+            started = time.perf_counter()
+            for index in range(0, chunks, max(1, chunks // 10)):
+                file.seek(index * args.chunk_size)
+                src.seek(0)
+                assert hsm.decrypt_chunk(src, index) == file.read(args.chunk_size), f"Chunk {index} mismatch"
+            elapsed = (time.perf_counter() - started) / len(range(0, chunks, max(1, chunks // 10)))
+        logging.info(f"decrypt_chunk: {elapsed * 1000:.2f}ms per chunk of {chunks}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Task6 benchmarks")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    batch_parser = subparsers.add_parser("batch", help="encrypt one by one against encrypt_many")
+    batch_parser.add_argument("--items", type=int, default=200)
+    batch_parser.add_argument("--distinct", type=int, default=100, help="distinct texts among the items")
+    batch_parser.add_argument("--latency", type=float, default=1.5, help="device seconds per call")
+    batch_parser.add_argument("--workers", type=int, nargs="+", default=[1, 8, 32])
+    batch_parser.set_defaults(func=benchmark_batch)
+
+    instrument_parser = subparsers.add_parser("instrument", help="overhead of the timing decorator and histograms")
+    instrument_parser.add_argument("--calls", type=int, default=200_000)
+    instrument_parser.set_defaults(func=benchmark_instrument)
+
+    factory_parser = subparsers.add_parser("factory", help="HSM per request against HSMFactory")
+    factory_parser.add_argument("--tenants", type=int, default=100)
+    factory_parser.add_argument("--requests", type=int, default=100_000)
+    factory_parser.set_defaults(func=benchmark_factory)
+
+    stream_parser = subparsers.add_parser("stream", help="streaming encryption of a large file against Fernet")
+    stream_parser.add_argument("--size", type=int, default=256 * 1024 * 1024, help="payload bytes")
+    stream_parser.add_argument("--chunk-size", type=int, default=stream.CHUNK_SIZE)
+    stream_parser.add_argument("--workers", type=int, nargs="+", default=[1, 4])
+    stream_parser.set_defaults(func=benchmark_stream)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(message)s',
+    )
+
+    main()
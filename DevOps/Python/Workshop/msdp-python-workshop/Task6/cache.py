@@ -0,0 +1,100 @@
+import threading
+import time
+
+
+from collections import OrderedDict
+
+
+MAXSIZE = 1024
+
+
+class CacheStats(object):
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        # callers which waited for a value being calculated by another thread instead of calculating it again
+        self.shared = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __str__(self):
+        return (
+            f"hits={self.hits} misses={self.misses} shared={self.shared} "
+            f"evictions={self.evictions} expirations={self.expirations}"
+        )
+
+
+class _Call(object):
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class Cache(object):
+    """
+    Thread safe cache of up to `maxsize` values, least recently used ones are evicted first.
+    Values older than `ttl` seconds (if set) are calculated again.
+
+    `get(key, function)` calls `function()` once per missing key: concurrent callers of the same key wait
+    for the first one and get its result (or exception), the function is called outside of the lock.
+    """
+    def __init__(self, maxsize=MAXSIZE, ttl=None, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        # key -> (expiration time or None, value), the most recently used are at the end
+        self.data = OrderedDict()
+        # key -> _Call being calculated
+        self.calls = {}
+        self.lock = threading.Lock()
+        self.stats = CacheStats()
+
+    def __len__(self):
+        return len(self.data)
+
+    def get(self, key, function):
+        with self.lock:
+            entry = self.data.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires is None or self.clock() < expires:
+                    self.data.move_to_end(key)
+                    self.stats.hits += 1
+                    return value
+                del self.data[key]
+                self.stats.expirations += 1
+            call = self.calls.get(key)
+            calculate = call is None
+            if calculate:
+                call = self.calls[key] = _Call()
+                self.stats.misses += 1
+            else:
+                self.stats.shared += 1
+
+        if not calculate:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+
+        try:
+            call.value = function()
+        except BaseException as err:
+            call.error = err
+            raise
+        else:
+            with self.lock:
+                self.data[key] = (self.clock() + self.ttl if self.ttl is not None else None, call.value)
+                while len(self.data) > self.maxsize:
+                    self.data.popitem(last=False)
+                    self.stats.evictions += 1
+            return call.value
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
@@ -1,25 +1,131 @@
 import base64
+import hashlib
+import instrument
 import random
+import stream
+import threading
 import time
 import utils
+import weakref
 
 
+from concurrent.futures import ThreadPoolExecutor
 from cryptography.fernet import Fernet
+from cryptography.fernet import MultiFernet
 
 
 class InvalidKeyException(Exception): pass
 
 
+# seconds range of the simulated device latency of a single call
+LATENCY = (1, 2)
+# requests in flight against the device in `encrypt_many()` and `decrypt_many()`
+WORKERS = 8
+# cached values per HSM
+CACHE_SIZE = 1024
+# seconds, encrypted tokens carry their creation time, so a cached one gets older with every use
+ENCRYPT_CACHE_TTL = 60
+# key handles (ready cipher suites) kept by `HSMFactory`
+HANDLES_CACHE_SIZE = 4096
+
+
+def key_fingerprint(key):
+    return hashlib.sha256(key).hexdigest()[:16]
+
+
+class KeyHandle(object):
+    """
+    Encoded keys with their cipher suite, the first key encrypts and all of them decrypt (`MultiFernet`).
+    HSM instances share a handle, so `rotate()` switches all of them at once.
+    """
+    def __init__(self, keys):
+        self.rotate(keys)
+
+    @classmethod
+    def from_state(cls, state):
+        handle = cls.__new__(cls)
+        handle.state = state
+        return handle
+
+    @staticmethod
+    def build(keys):
+        """
+        Return handle state of `keys`: (keys, fingerprint of the first key, cipher suite).
+        """
+        keys = list(keys)
+        cipher_suite = Fernet(keys[0]) if len(keys) == 1 else MultiFernet([Fernet(key) for key in keys])
+        return keys, key_fingerprint(keys[0]), cipher_suite
+
+    def rotate(self, keys):
+        # replaced by a single assignment, concurrent readers see either the old or the new state
+        self.state = self.build(keys)
+
+    @property
+    def keys(self):
+        return self.state[0]
+
+    @property
+    def fingerprint(self):
+        return self.state[1]
+
+    @property
+    def cipher_suite(self):
+        return self.state[2]
+
+
+def encrypt_cache_key(hsm, text):
+    # instances with the same key share values, an instance itself is not kept in the cache
+    return (hsm.fingerprint, HSM.to_bytes(text)) if hsm.cache_encrypt else None
+
+
+def decrypt_cache_key(hsm, token):
+    return (hsm.fingerprint, HSM.to_bytes(token)) if hsm.cache_decrypt else None
+
+
 class HSM(object):
-    def __init__(self, key=None):
-        if key is None:
-            self.key = self.generate_key()
-        elif len(key) == 32:
-            self.key = base64.b64encode(self.to_bytes(key))
-        else:
-            raise InvalidKeyException("32-bytes key expected")
+    """
+    `cache_encrypt` is an opt-in: Fernet tokens are random and hold the encryption time, so with it the same text
+    gets the same token (up to `ENCRYPT_CACHE_TTL` seconds old) instead of a fresh one. Use it only where
+    identical tokens for identical texts are acceptable.
 
-        self.cipher_suite = Fernet(self.key)
+    `cache_decrypt` is an opt-in as well: decrypted texts are kept in memory (up to `CACHE_SIZE` of them, without
+    expiration) and a token is not checked against its TTL or the current keys once it is cached.
+
+    `latency` range and `sleep` function simulate the device, a benchmark can pass a fake clock.
+
+    Services creating an HSM per request should use `HSMFactory`, it reuses cipher suites of the same key.
+    """
+    def __init__(self, key=None, cache_encrypt=False, cache_decrypt=False, latency=LATENCY, sleep=time.sleep):
+        self.handle = KeyHandle([self.generate_key() if key is None else self.encode_key(key)])
+        self.cache_encrypt = cache_encrypt
+        self.cache_decrypt = cache_decrypt
+        self.latency = latency
+        self.sleep = sleep
+
+    @classmethod
+    def from_handle(cls, handle, cache_encrypt=False, cache_decrypt=False, latency=LATENCY, sleep=time.sleep):
+        """
+        Return HSM using ready `handle` instead of building the cipher suite.
+        """
+        hsm = cls.__new__(cls)
+        hsm.handle = handle
+        hsm.cache_encrypt = cache_encrypt
+        hsm.cache_decrypt = cache_decrypt
+        hsm.latency = latency
+        hsm.sleep = sleep
+        return hsm
+
+    @property
+    def key(self):
+        return self.handle.keys[0]
+
+    @property
+    def fingerprint(self):
+        return self.handle.fingerprint
+
+    @property
+    def cipher_suite(self):
+        return self.handle.cipher_suite
 
     def __str__(self):
         return "HSM"
@@ -28,19 +134,150 @@ class HSM(object):
     Step 3.2. Apply memoization decorator to HSM.encrypt() method in order to return from cache previously encrypted text
     """
     ### Block implemented by student
+    @utils.cache_it(maxsize=CACHE_SIZE, ttl=ENCRYPT_CACHE_TTL, key=encrypt_cache_key)
     ### Block implemented by student
     def encrypt(self, text):
-        time.sleep(random.uniform(1, 2))
+        self.sleep(random.uniform(*self.latency))
         return self.cipher_suite.encrypt(self.to_bytes(text))
 
+    @utils.cache_it(maxsize=CACHE_SIZE, key=decrypt_cache_key)
     def decrypt(self, text):
-        time.sleep(random.uniform(1, 2))
+        self.sleep(random.uniform(*self.latency))
         return self.cipher_suite.decrypt(self.to_bytes(text))
 
+    def encrypt_many(self, texts, workers=WORKERS):
+        """
+        Encrypt `texts` with up to `workers` device calls in flight, each distinct text is encrypted once
+        (repeated texts get the same token). Returns tokens in `texts` order, a failed item gets its exception
+        instead of a token and does not affect the others.
+        """
+        return self._many(self.encrypt, texts, workers)
+
+    def decrypt_many(self, tokens, workers=WORKERS):
+        """
+        Decrypt `tokens` like `encrypt_many()`, e.g. `cryptography.fernet.InvalidToken` is returned for a broken one.
+        """
+        return self._many(self.decrypt, tokens, workers)
+
+    def _many(self, function, items, workers):
+        # an item which is not a text gets its error, it is not sent to the device
+        keys = []
+        for item in items:
+            try:
+                keys.append(self.to_bytes(item))
+            except Exception as err:
+                keys.append(err)
+        distinct = list(dict.fromkeys(key for key in keys if not isinstance(key, Exception)))
+
+        def call(item):
+            try:
+                return function(item)
+            except Exception as err:
+                return err
+
+        results = {}
+        if distinct:
+            with ThreadPoolExecutor(max_workers=min(workers, len(distinct))) as pool:
+                results = dict(zip(distinct, pool.map(call, distinct)))
+        return [key if isinstance(key, Exception) else results[key] for key in keys]
+
+    def encrypt_stream(self, src, dst, chunk_size=stream.CHUNK_SIZE, workers=1):
+        """
+        Encrypt binary file object `src` into `dst` by `chunk_size` chunks, for payloads too large for `encrypt()`.
+        Memory use does not depend on the payload size, `workers` threads encrypt chunks in parallel.
+        """
+        self.sleep(random.uniform(*self.latency))
+        stream.encrypt(src, dst, self.key, chunk_size, workers)
+
+    def decrypt_stream(self, src, dst, workers=1):
+        """
+        Decrypt `encrypt_stream()` output, `stream.InvalidStreamException` is raised for a corrupted, reordered
+        or truncated stream. Data of the chunks before the broken one is already written to `dst`.
+        """
+        self.sleep(random.uniform(*self.latency))
+        stream.decrypt(src, dst, self.handle.keys, workers)
+
+    def decrypt_chunk(self, src, index):
+        """
+        Return chunk `index` of seekable `encrypt_stream()` output without decrypting the rest.
+        """
+        self.sleep(random.uniform(*self.latency))
+        return stream.decrypt_chunk(src, self.handle.keys, index)
+
     @staticmethod
     def generate_key():
         return Fernet.generate_key()
 
+    @classmethod
+    def encode_key(cls, key):
+        if len(key) != 32:
+            raise InvalidKeyException("32-bytes key expected")
+        return base64.b64encode(cls.to_bytes(key))
+
     @staticmethod
     def to_bytes(text):
         return text if isinstance(text, bytes) else text.encode("utf-8")
+
+
+class HSMFactory(object):
+    """
+    Creates HSMs for 32-bytes keys. Key handles (cipher suites) are kept in a plain dictionary by the key itself,
+    so an HSM for an already seen key costs a dictionary hit. Up to `maxsize` keys are kept, the earliest added
+    is evicted first (a hit does not reorder the dictionary). `options` are passed to every HSM.
+    Handle construction durations (cache misses) are recorded into `timings`, hits are not timed.
+
+    Rotated key sets are never forgotten: a handle of an evicted key is built from its rotated key set again,
+    so a rotated-out key does not encrypt anymore.
+    """
+    def __init__(self, maxsize=HANDLES_CACHE_SIZE, **options):
+        self.maxsize = maxsize
+        # key as passed to `get()` -> handle
+        self.handles = {}
+        self.options = options
+        # fingerprint -> handle state of the rotated key set
+        self.rotations = {}
+        # fingerprint -> handle of every key with a handle in use (cached or held by an HSM), `rotate()` updates them
+        self.live = weakref.WeakValueDictionary()
+        self.lock = threading.Lock()
+        self.timings = instrument.Registry()
+
+    def _build(self, key):
+        started = time.perf_counter_ns()
+        encoded = HSM.encode_key(key)
+        fingerprint = key_fingerprint(encoded)
+        with self.lock:
+            handle = self.live.get(fingerprint)
+            if handle is None:
+                state = self.rotations.get(fingerprint)
+                handle = KeyHandle([encoded]) if state is None else KeyHandle.from_state(state)
+                self.live[fingerprint] = handle
+            self.handles[key] = handle
+            while len(self.handles) > self.maxsize:
+                del self.handles[next(iter(self.handles))]
+        self.timings.record("HSMFactory.build", time.perf_counter_ns() - started)
+        return handle
+
+    def handle(self, key):
+        handle = self.handles.get(key)
+        return self._build(key) if handle is None else handle
+
+    def get(self, key):
+        handle = self.handles.get(key)
+        if handle is None:
+            handle = self._build(key)
+        return HSM.from_handle(handle, **self.options)
+
+    def rotate(self, key, new_key):
+        """
+        Make `new_key` the encrypting key of `key` handle, the previous keys still decrypt. The cipher suite
+        is built once and shared by the handles of all the keys, their HSMs use the new key right away.
+        """
+        encoded = HSM.encode_key(new_key)
+        keys = [encoded] + [previous for previous in self.handle(key).keys if previous != encoded]
+        state = KeyHandle.build(keys)
+        with self.lock:
+            for fingerprint in map(key_fingerprint, keys):
+                self.rotations[fingerprint] = state
+                handle = self.live.get(fingerprint)
+                if handle is not None:
+                    handle.state = state
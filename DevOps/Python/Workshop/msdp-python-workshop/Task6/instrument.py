@@ -0,0 +1,241 @@
+import functools
+import json
+import logging
+import threading
+import time
+import utils
+
+try:
+    from prometheus_client.core import CounterMetricFamily
+    from prometheus_client.core import GaugeMetricFamily
+except ImportError:
+    CounterMetricFamily = GaugeMetricFamily = None
+
+
+# values are kept with 2 ** -(SUB_BUCKET_BITS - 1) relative precision (under 1%)
+SUB_BUCKET_BITS = 8
+QUANTILES = [0.5, 0.9, 0.99]
+
+
+def bucket(value):
+    """
+    Index of log-linear (HDR-style) bucket of non-negative integer `value`, indexes grow with values.
+    """
+    exponent = max(value.bit_length() - SUB_BUCKET_BITS, 0)
+    return (exponent << SUB_BUCKET_BITS) + (value >> exponent)
+
+
+def bucket_value(index):
+    """
+    The lowest value of bucket `index`.
+    """
+    exponent, sub_bucket = divmod(index, 1 << SUB_BUCKET_BITS)
+    return sub_bucket << exponent
+
+
+def time_it(function):
+    """
+    Log the duration of every `function` call (Step 2.1), `Registry.wrap()` aggregates them instead.
+    """
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            logging.debug(
+                f"=== time_it ===> '{function.__name__}({utils.params_to_str(*args, **kwargs)})' "
+                f"duration '{time.perf_counter() - started:.2f}'"
+            )
+    return wrapper
+
+
+class Histogram(object):
+    """
+    Latency histogram in nanoseconds, it is updated by a single thread without locks.
+    """
+    def __init__(self):
+        self.counts = {}
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def add(self, value):
+        # `bucket()` inlined, it is the hot path
+        exponent = value.bit_length() - SUB_BUCKET_BITS
+        index = (exponent << SUB_BUCKET_BITS) + (value >> exponent) if exponent > 0 else value
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        # a copy of the dict is taken at once, the owner thread may add values meanwhile
+        for index, count in dict(other.counts).items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def quantile(self, quantile):
+        if not self.count:
+            return 0
+        if quantile >= 1:
+            return self.max
+        rank = quantile * self.count
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(bucket_value(index), self.max)
+        return self.max
+
+    def summary(self):
+        """
+        Dict of count, mean, quantiles and max in seconds.
+        """
+        summary = {"count": self.count, "mean": self.total / self.count / 1e9 if self.count else 0.0}
+        for quantile in QUANTILES:
+            summary[f"p{quantile * 100:g}"] = self.quantile(quantile) / 1e9
+        summary["max"] = self.max / 1e9
+        return summary
+
+
+class Registry(object):
+    """
+    Per function latency histograms. Each thread records into its own histograms, `snapshot()` merges them;
+    histograms of finished threads are folded into `retired` ones so short-lived pool threads do not pile up.
+    Nothing is recorded while `enabled` is False, then an instrumented call costs one attribute check.
+    """
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.local = threading.local()
+        # (thread, {name: Histogram}) of every thread which recorded something
+        self.threads = []
+        self.retired = {}
+        self.lock = threading.Lock()
+
+    def _histograms(self):
+        histograms = getattr(self.local, "histograms", None)
+        if histograms is None:
+            histograms = self.local.histograms = {}
+            with self.lock:
+                self.threads.append((threading.current_thread(), histograms))
+        return histograms
+
+    def record(self, name, nanoseconds):
+        histograms = self._histograms()
+        histogram = histograms.get(name)
+        if histogram is None:
+            histogram = histograms[name] = Histogram()
+        histogram.add(nanoseconds)
+
+    def snapshot(self):
+        """
+        Return {name: Histogram} of all the threads.
+        """
+        with self.lock:
+            alive = []
+            for thread, histograms in self.threads:
+                if thread.is_alive():
+                    alive.append((thread, histograms))
+                    continue
+                for name, histogram in list(histograms.items()):
+                    self.retired.setdefault(name, Histogram()).merge(histogram)
+            self.threads = alive
+            merged = {}
+            for name, histogram in self.retired.items():
+                merged.setdefault(name, Histogram()).merge(histogram)
+            for _, histograms in alive:
+                for name, histogram in list(histograms.items()):
+                    merged.setdefault(name, Histogram()).merge(histogram)
+        return merged
+
+    def reset(self):
+        with self.lock:
+            for _, histograms in self.threads:
+                histograms.clear()
+            self.retired.clear()
+
+    def wrap(self, function, name=None):
+        name = name or function.__qualname__
+        local = self.local
+        clock = time.perf_counter_ns
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not self.enabled:
+                return function(*args, **kwargs)
+            started = clock()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed = clock() - started
+                try:
+                    local.histograms[name].add(elapsed)
+                except (AttributeError, KeyError):
+                    # the first call of the function in this thread
+                    self.record(name, elapsed)
+        wrapper.instrumented = function
+        return wrapper
+
+    def patch(self, owner, *names):
+        """
+        Replace `names` attributes (methods) of `owner` (a class or a module) with instrumented ones.
+        """
+        for name in names:
+            function = getattr(owner, name)
+            setattr(owner, name, self.wrap(function, f"{getattr(owner, '__name__', owner)}.{name}"))
+
+    @staticmethod
+    def unpatch(owner, *names):
+        for name in names:
+            setattr(owner, name, getattr(owner, name).instrumented)
+
+    def summary(self):
+        return {name: histogram.summary() for name, histogram in sorted(self.snapshot().items())}
+
+    def table(self):
+        """
+        Return the summary as a text table, times in milliseconds.
+        """
+        columns = ["count", "mean"] + [f"p{quantile * 100:g}" for quantile in QUANTILES] + ["max"]
+        summary = self.summary()
+        width = max([len("function")] + [len(name) for name in summary])
+        lines = [f"{'function':<{width}}" + "".join(f"{column:>10}" for column in columns)]
+        for name, values in summary.items():
+            lines.append(
+                f"{name:<{width}}{values['count']:>10}"
+                + "".join(f"{values[column] * 1000:>10.2f}" for column in columns[1:])
+            )
+        return "\n".join(lines)
+
+    def to_json(self):
+        return json.dumps(self.summary(), indent=2)
+
+    def describe(self):
+        return []
+
+    def collect(self):
+        """
+        `prometheus_client` collector interface: register the registry to export latencies.
+        """
+        if GaugeMetricFamily is None:
+            raise RuntimeError("prometheus_client is not installed")
+        quantiles = GaugeMetricFamily(
+            "function_latency_seconds", "Latency quantiles of instrumented functions", labels=["function", "quantile"]
+        )
+        calls = CounterMetricFamily("function_calls", "Calls of instrumented functions", labels=["function"])
+        seconds = CounterMetricFamily("function_time_seconds", "Total time of instrumented functions", labels=["function"])
+        for name, histogram in sorted(self.snapshot().items()):
+            for quantile in QUANTILES + [1.0]:
+                quantiles.add_metric([name, f"{quantile:g}"], histogram.quantile(quantile) / 1e9)
+            calls.add_metric([name], histogram.count)
+            seconds.add_metric([name], histogram.total / 1e9)
+        yield quantiles
+        yield calls
+        yield seconds
+
+
+REGISTRY = Registry()
@@ -0,0 +1,172 @@
+import base64
+import hashlib
+import io
+import os
+import struct
+
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+
+
+class InvalidStreamException(Exception): pass
+
+
+MAGIC = b"HSMS"
+VERSION = 1
+# plaintext bytes per chunk, the last chunk may be shorter
+CHUNK_SIZE = 1024 * 1024
+# magic, version, chunk size, key id, salt of the stream key
+HEADER = struct.Struct(">4sBI8s16s")
+# sequence number of the chunk
+FRAME_HEADER = struct.Struct(">Q")
+TAG_SIZE = 16
+SALT_SIZE = 16
+# chunks in flight per worker, it bounds the memory of a parallel run
+CHUNKS_PER_WORKER = 2
+
+
+def key_id(key):
+    return hashlib.sha256(key).digest()[:8]
+
+
+def stream_cipher(key, salt):
+    """
+    AES-256-GCM cipher of a single stream, its key is derived from Fernet `key` (url-safe base64) and `salt`,
+    so sequence numbers can be used as nonces.
+    """
+    hkdf = HKDF(algorithm=hashes.SHA256(), length=32, salt=salt, info=MAGIC)
+    return AESGCM(hkdf.derive(base64.urlsafe_b64decode(key)))
+
+
+def nonce(sequence, last):
+    # the last chunk has its own nonces, so a stream cut at a chunk boundary does not decrypt
+    return sequence.to_bytes(11, "big") + (b"\x01" if last else b"\x00")
+
+
+def read(src, size):
+    """
+    Read up to `size` bytes, less only at the end of `src`.
+    """
+    data = src.read(size)
+    if len(data) < size:
+        parts = [data]
+        while data and size > 0:
+            size -= len(data)
+            data = src.read(size)
+            parts.append(data)
+        data = b"".join(parts)
+    return data
+
+
+def chunks(src, size):
+    """
+    Yield (sequence, chunk, last) of `src` read by `size` bytes, an empty `src` gives a single empty last chunk.
+    """
+    sequence = 0
+    chunk = read(src, size)
+    while True:
+        following = read(src, size) if len(chunk) == size else b""
+        yield sequence, chunk, not following
+        if not following:
+            return
+        sequence += 1
+        chunk = following
+
+
+def pipeline(function, items, dst, workers):
+    """
+    Write `function(*item)` of each item to `dst` in order, `workers` threads with a bounded number of items
+    in flight.
+    """
+    if workers <= 1:
+        for item in items:
+            dst.write(function(*item))
+        return
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for item in items:
+            pending.append(pool.submit(function, *item))
+            if len(pending) >= workers * CHUNKS_PER_WORKER:
+                dst.write(pending.popleft().result())
+        while pending:
+            dst.write(pending.popleft().result())
+
+
+def encrypt(src, dst, key, chunk_size=CHUNK_SIZE, workers=1):
+    """
+    Encrypt binary file object `src` into `dst` with Fernet `key`. The stream is a header followed by frames
+    of the chunk sequence number and the AES-GCM encrypted chunk, the header is authenticated with every chunk.
+    """
+    if chunk_size <= 0:
+        raise ValueError("chunk_size should be positive")
+    salt = os.urandom(SALT_SIZE)
+    header = HEADER.pack(MAGIC, VERSION, chunk_size, key_id(key), salt)
+    cipher = stream_cipher(key, salt)
+
+    def seal(sequence, chunk, last):
+        return FRAME_HEADER.pack(sequence) + cipher.encrypt(nonce(sequence, last), chunk, header)
+
+    dst.write(header)
+    pipeline(seal, chunks(src, chunk_size), dst, workers)
+
+
+class Reader(object):
+    """
+    Opened encrypted stream, `keys` are Fernet keys the stream may be encrypted with.
+    `src` should be positioned at the stream header.
+    """
+    def __init__(self, src, keys):
+        self.src = src
+        self.start = src.tell() if src.seekable() else None
+        self.header = read(src, HEADER.size)
+        if len(self.header) < HEADER.size:
+            raise InvalidStreamException("Truncated stream header")
+        magic, version, self.chunk_size, stream_key_id, salt = HEADER.unpack(self.header)
+        if magic != MAGIC or version != VERSION:
+            raise InvalidStreamException("Not an encrypted stream or unsupported version")
+        key = next((key for key in keys if key_id(key) == stream_key_id), None)
+        if key is None:
+            raise InvalidStreamException("Stream is encrypted with an unknown key")
+        self.cipher = stream_cipher(key, salt)
+        self.frame_size = FRAME_HEADER.size + self.chunk_size + TAG_SIZE
+
+    def open(self, sequence, frame, last):
+        if len(frame) < FRAME_HEADER.size + TAG_SIZE:
+            raise InvalidStreamException(f"Truncated chunk {sequence}")
+        stored, = FRAME_HEADER.unpack_from(frame)
+        if stored != sequence:
+            raise InvalidStreamException(f"Chunk {sequence} expected, got {stored}")
+        try:
+            return self.cipher.decrypt(nonce(sequence, last), frame[FRAME_HEADER.size:], self.header)
+        except InvalidTag:
+            raise InvalidStreamException(f"Chunk {sequence} is corrupted or the stream is truncated") from None
+
+    def decrypt(self, dst, workers=1):
+        pipeline(self.open, chunks(self.src, self.frame_size), dst, workers)
+
+    def chunk(self, index):
+        """
+        Decrypt chunk `index` only, `src` should be seekable. Chunks can be read in any order.
+        """
+        if self.start is None:
+            raise io.UnsupportedOperation("Random access needs a seekable stream")
+        size = self.src.seek(0, io.SEEK_END)
+        offset = self.start + HEADER.size + index * self.frame_size
+        if index < 0 or offset >= size:
+            raise IndexError(f"No chunk {index} in the stream")
+        self.src.seek(offset)
+        frame = read(self.src, self.frame_size)
+        return self.open(index, frame, offset + len(frame) == size)
+
+
+def decrypt(src, dst, keys, workers=1):
+    Reader(src, keys).decrypt(dst, workers)
+
+
+def decrypt_chunk(src, keys, index):
+    return Reader(src, keys).chunk(index)
@@ -0,0 +1,108 @@
+import threading
+
+import cache
+import utils
+
+
+class Clock(object):
+    def __init__(self):
+        self.time = 0.0
+
+    def __call__(self):
+        return self.time
+
+
+def test_evicts_least_recently_used():
+    values = cache.Cache(maxsize=2)
+    values.get("a", lambda: 1)
+    values.get("b", lambda: 2)
+    assert values.get("a", lambda: None) == 1
+    values.get("c", lambda: 3)
+
+    assert len(values) == 2
+    assert values.get("b", lambda: "again") == "again"
+    assert values.get("c", lambda: None) == 3
+    assert values.stats.evictions == 2
+
+
+def test_expires_values_after_ttl():
+    clock = Clock()
+    values = cache.Cache(ttl=10, clock=clock)
+    values.get("a", lambda: 1)
+    clock.time = 9.9
+    assert values.get("a", lambda: 2) == 1
+    clock.time = 10
+    assert values.get("a", lambda: 2) == 2
+    assert values.stats.expirations == 1
+    clock.time = 19.9
+    assert values.get("a", lambda: 3) == 2
+
+
+def test_calculates_missing_key_once_for_concurrent_callers():
+    values = cache.Cache()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def calculate():
+        calls.append(threading.current_thread())
+        started.set()
+        release.wait()
+        return "value"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(values.get("key", calculate))) for _ in range(4)]
+    threads[0].start()
+    started.wait()
+    for thread in threads[1:]:
+        thread.start()
+    while values.stats.shared < 3:
+        threading.Event().wait(0.001)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert results == ["value"] * 4
+    assert values.stats.misses == 1 and values.stats.shared == 3
+
+
+def test_concurrent_callers_get_the_error():
+    values = cache.Cache()
+    release = threading.Event()
+
+    def calculate():
+        release.wait()
+        raise ValueError("broken")
+
+    errors = []
+
+    def get():
+        try:
+            values.get("key", calculate)
+        except ValueError as err:
+            errors.append(err)
+
+    threads = [threading.Thread(target=get) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    while values.stats.misses + values.stats.shared < 3:
+        threading.Event().wait(0.001)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(errors) == 3 and len(set(map(id, errors))) == 1
+    assert len(values) == 0 and values.get("key", lambda: 1) == 1
+
+
+def test_cache_it_does_not_log_arguments(caplog):
+    @utils.cache_it()
+    def shout(text):
+        return text.upper()
+
+    with caplog.at_level("DEBUG"):
+        assert [shout("secret"), shout("plain"), shout("secret")] == ["SECRET", "PLAIN", "SECRET"]
+    assert "secret" not in caplog.text.lower() and "plain" not in caplog.text.lower()
+    assert caplog.text.count("calculating new value") == 2
+    assert caplog.text.count("using already calculated value") == 1
+    assert shout("plain") == "PLAIN" and shout.cache.stats.hits == 2
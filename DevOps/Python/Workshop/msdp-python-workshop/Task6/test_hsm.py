@@ -0,0 +1,125 @@
+import threading
+
+from hsm import HSM
+from hsm import HSMFactory
+
+
+LATENCY = 1.5
+# seconds, a guard against hanging on a broken implementation, the tests do not depend on it
+TIMEOUT = 10
+
+
+class ManualClock(object):
+    """
+    Device clock for `HSM(sleep=...)` driven by the test: `sleep()` blocks until `advance()` moves the virtual
+    `time` to its wake up time, so overlapping calls are counted without real sleeping.
+    """
+    def __init__(self):
+        self.time = 0.0
+        self.calls = 0
+        self.wakeups = []
+        self.condition = threading.Condition()
+
+    def sleep(self, seconds):
+        with self.condition:
+            self.calls += 1
+            wakeup = self.time + seconds
+            self.wakeups.append(wakeup)
+            self.condition.notify_all()
+            self.condition.wait_for(lambda: self.time >= wakeup)
+            self.wakeups.remove(wakeup)
+
+    def pending(self):
+        # woken calls may not have left `sleep()` yet
+        return [wakeup for wakeup in self.wakeups if wakeup > self.time]
+
+    def advance(self, sleepers):
+        """
+        Wait until `sleepers` calls sleep, then move the time to the nearest wake up.
+        """
+        with self.condition:
+            assert self.condition.wait_for(lambda: len(self.pending()) == sleepers, TIMEOUT), \
+                f"{len(self.pending())} sleeping calls instead of {sleepers}"
+            self.time = min(self.pending())
+            self.condition.notify_all()
+
+
+def run(clock, function, batches):
+    """
+    Call `function()` in a thread, advancing `clock` once per batch of concurrent device calls of `batches` sizes.
+    """
+    results = []
+    thread = threading.Thread(target=lambda: results.append(function()))
+    thread.start()
+    for sleepers in batches:
+        clock.advance(sleepers)
+    thread.join(TIMEOUT)
+    assert not thread.is_alive() and results, "function did not finish after the expected batches"
+    return results[0]
+
+
+def device(clock):
+    return HSM(latency=(LATENCY, LATENCY), sleep=clock.sleep)
+
+
+def test_encrypt_many_overlaps_device_calls():
+    texts = [f"text-{index}" for index in range(20)]
+
+    clock = ManualClock()
+    hsm = device(clock)
+    run(clock, lambda: [hsm.encrypt(text) for text in texts], [1] * len(texts))
+    assert clock.time == len(texts) * LATENCY
+
+    clock = ManualClock()
+    hsm = device(clock)
+    tokens = run(clock, lambda: hsm.encrypt_many(texts, workers=8), [8, 8, 4])
+    assert clock.time == 3 * LATENCY
+    assert clock.calls == len(texts)
+    assert [hsm.cipher_suite.decrypt(token) for token in tokens] == [text.encode() for text in texts]
+
+
+def test_encrypt_many_calls_device_once_per_distinct_text():
+    texts = ["pear", "apple", "pear", "banana", "apple", "pear"]
+
+    clock = ManualClock()
+    hsm = device(clock)
+    tokens = run(clock, lambda: hsm.encrypt_many(texts, workers=2), [2, 1])
+    assert clock.calls == 3
+    assert clock.time == 2 * LATENCY
+    assert tokens[0] == tokens[2] == tokens[5] and tokens[1] == tokens[4]
+    assert run(clock, lambda: hsm.decrypt_many(tokens, workers=2), [2, 1]) == [text.encode() for text in texts]
+
+
+def test_many_isolates_item_errors():
+    hsm = HSM(latency=(0, 0))
+    tokens = hsm.encrypt_many(["pear", None, 5, b"apple"])
+    assert isinstance(tokens[1], Exception) and isinstance(tokens[2], Exception)
+    assert hsm.decrypt_many([tokens[0], b"broken", tokens[3]])[::2] == [b"pear", b"apple"]
+    assert isinstance(hsm.decrypt_many([b"broken"])[0], Exception)
+
+
+def test_factory_reuses_handles():
+    factory = HSMFactory(latency=(0, 0))
+    first = factory.get("a" * 32)
+    assert factory.get("a" * 32).handle is first.handle
+    assert factory.get(b"a" * 32).handle is first.handle
+    assert factory.timings.snapshot()["HSMFactory.build"].count == 2
+
+
+def test_factory_honours_evicted_rotation():
+    factory = HSMFactory(maxsize=1, latency=(0, 0))
+    old = factory.get("a" * 32)
+    token = old.encrypt("text")
+    factory.rotate("a" * 32, "b" * 32)
+    # the handle of an HSM in use switches to the new key
+    assert old.key == HSM.encode_key("b" * 32)
+
+    for tenant in range(3):
+        factory.get(f"{tenant:032d}")
+    del old
+    assert "a" * 32 not in factory.handles
+
+    hsm = factory.get("a" * 32)
+    assert hsm.key == HSM.encode_key("b" * 32)
+    assert hsm.decrypt(token) == b"text"
+    assert HSM("b" * 32, latency=(0, 0)).decrypt(hsm.encrypt("text")) == b"text"
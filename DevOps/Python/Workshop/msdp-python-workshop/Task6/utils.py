@@ -1,3 +1,5 @@
+import cache
+import functools
 import logging
 import random
 import time
@@ -18,6 +20,7 @@ Step 2.1. Write decorator to measure function execution time:
     * use `time.perf_counter()` as monothonic time source
 """
 ### Block implemented by student
+# `instrument.time_it()`, the client aggregates latencies with `instrument.Registry` instead of a log line per call
 ### Block implemented by student
 
 
@@ -27,6 +30,40 @@ Step 3.1. Write decorator to cache function output based on input arguments:
     * use positional arguments as a cache keys, ignore keyword arguments
 """
 ### Block implemented by student
+def cache_it(maxsize=cache.MAXSIZE, ttl=None, key=None):
+    """
+    Cache function output in `cache.Cache` of `maxsize` values living up to `ttl` seconds.
+    `key(*args)` makes the cache key of positional arguments (they are the key by default), a method should use it
+    to keep `self` out of the cache. The call is not cached when `key` returns None.
+    The cache is available as `cache` attribute of the decorated function.
+    """
+    def decorator(function):
+        values = cache.Cache(maxsize, ttl)
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            cache_key = key(*args) if key is not None else args
+            if cache_key is None:
+                return function(*args, **kwargs)
+            if not logging.root.isEnabledFor(logging.DEBUG):
+                return values.get(cache_key, lambda: function(*args, **kwargs))
+
+            # arguments are not logged, they are plaintexts and tokens for HSM methods
+            calculated = []
+
+            def calculate():
+                calculated.append(True)
+                logging.debug("=== cache_it ===> calculating new value of '%s'", function.__qualname__)
+                return function(*args, **kwargs)
+
+            value = values.get(cache_key, calculate)
+            if not calculated:
+                logging.debug("=== cache_it ===> using already calculated value of '%s'", function.__qualname__)
+            return value
+
+        wrapper.cache = values
+        return wrapper
+    return decorator
 ### Block implemented by student
 
 
@@ -0,0 +1,151 @@
+import asyncio
+import collections
+import logging
+import threading
+import time
+import requests
+import requests.adapters
+import requests.auth
+
+
+from urllib3.util.retry import Retry
+
+
+API_URL = "http://localhost:5000"
+API_USERNAME = "username"
+API_PASSWORD = "password"
+
+# keep-alive connections kept open per host
+POOL_SIZE = 10
+# number of retries on connection errors and 5xx responses, with exponential backoff between them
+RETRIES = 3
+BACKOFF_FACTOR = 0.3
+RETRY_STATUSES = (500, 502, 503, 504)
+# (connect, read) timeouts in seconds
+TIMEOUT = (3.05, 30)
+# requests kept in flight by `ApiClient.post_many()`
+CONCURRENCY = 20
+
+
+class LatencyCounter(object):
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    @property
+    def average(self):
+        return self.total / self.count if self.count else 0.0
+
+    def __str__(self):
+        return f"count={self.count} avg={self.average * 1000:.1f}ms max={self.max * 1000:.1f}ms"
+
+
+class ApiClient(object):
+    """
+    API client which keeps TCP connections alive between calls and reuses basic auth setup.
+    Every call is timed and accounted in per-endpoint `latency` counters.
+    """
+    def __init__(self, url=API_URL, username=None, password=None,
+                 pool_size=POOL_SIZE, retries=RETRIES, backoff_factor=BACKOFF_FACTOR, timeout=TIMEOUT):
+        self.url = url.rstrip("/")
+        self.username = username
+        self.password = password
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.timeout = timeout
+        self.latency = collections.defaultdict(LatencyCounter)
+        self._latency_lock = threading.Lock()
+
+        self.session = requests.Session()
+        if username is not None:
+            self.session.auth = requests.auth.HTTPBasicAuth(username, password)
+
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=RETRY_STATUSES,
+            # API checks are safe to repeat, so POST requests are retried as well
+            allowed_methods=None,
+            # return the last response instead of raising when retries are exhausted
+            raise_on_status=False,
+        )
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.session.close()
+
+    def _account(self, endpoint, started):
+        elapsed = time.perf_counter() - started
+        with self._latency_lock:
+            self.latency[endpoint].add(elapsed)
+
+    def request(self, method, endpoint, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        started = time.perf_counter()
+        try:
+            return self.session.request(method, self.url + endpoint, **kwargs)
+        finally:
+            # for streamed responses it is the time till response headers are received
+            self._account(endpoint, started)
+
+    def get(self, endpoint, **kwargs):
+        return self.request("GET", endpoint, **kwargs)
+
+    def post(self, endpoint, **kwargs):
+        return self.request("POST", endpoint, **kwargs)
+
+    def post_many(self, checks, concurrency=CONCURRENCY):
+        """
+        POST every (endpoint, payload) pair from `checks` with up to `concurrency` requests in flight.
+        Returns list of response status codes in the input order. A check failed with a network error or timeout
+        after all the retries gets its exception instead of a status code and does not affect the others.
+        """
+        return asyncio.run(self._post_many(checks, concurrency))
+
+    async def _post_many(self, checks, concurrency):
+        # only batches need aiohttp, clients making single calls do not depend on it
+        import aiohttp
+
+        semaphore = asyncio.Semaphore(concurrency)
+        auth = aiohttp.BasicAuth(self.username, self.password) if self.username is not None else None
+        timeout = aiohttp.ClientTimeout(sock_connect=self.timeout[0], sock_read=self.timeout[1])
+        connector = aiohttp.TCPConnector(limit=concurrency)
+
+        async with aiohttp.ClientSession(auth=auth, timeout=timeout, connector=connector) as session:
+            async def post(endpoint, payload):
+                async with semaphore:
+                    for attempt in range(self.retries + 1):
+                        started = time.perf_counter()
+                        try:
+                            async with session.post(self.url + endpoint, data=payload) as response:
+                                await response.read()
+                            result = response.status
+                        except (aiohttp.ClientError, asyncio.TimeoutError) as err:
+                            result = err
+                        finally:
+                            self._account(endpoint, started)
+                        if (not isinstance(result, Exception) and result not in RETRY_STATUSES) or attempt == self.retries:
+                            return result
+                        logging.debug(f"Retrying {endpoint} after {result!r}")
+                        await asyncio.sleep(self.backoff_factor * 2 ** attempt)
+
+            return await asyncio.gather(*(post(endpoint, payload) for endpoint, payload in checks))
+
+    def log_latency(self, level=logging.DEBUG):
+        with self._latency_lock:
+            for endpoint, counter in sorted(self.latency.items()):
+                logging.log(level, f"{endpoint}: {counter}")
@@ -0,0 +1,149 @@
+import argparse
+import collections
+import logging
+import logscan
+import operator
+import os
+import random
+import re
+import tempfile
+import time
+import tracemalloc
+
+
+STATUS_PATTERN = rb'HTTP.+" (?P<status_code>\d+) (?P<bytes>\d+) '
+IP_PATTERN = rb"[0-9]{1,3}\.[0-9]{1,3}\.[0-9]{1,3}\.[0-9]{1,3}"
+
+METHODS = ["GET", "GET", "GET", "POST", "HEAD"]
+URLS = ["/downloads/product_1", "/downloads/product_2", "/downloads/product_3", "/", "/index.html", "/api/v1/items?page=2"]
+STATUSES = [200] * 20 + [304] * 5 + [301, 302, 400, 403, 404, 404, 404, 500, 502, 503]
+AGENTS = [
+    "Debian APT-HTTP/1.3 (0.8.16~exp12ubuntu10.21)",
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/86.0 Safari/537.36",
+    "curl/7.68.0",
+]
+SIZE_UNITS = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+
+
+def parse_size(size):
+    size = size.upper()
+    if size[-1] in SIZE_UNITS:
+        return int(float(size[:-1]) * SIZE_UNITS[size[-1]])
+    return int(size)
+
+
+def generate_log(path, size, seed=0, ips=100_000, miss_rate=0.0001):
+    """
+    Write synthetic nginx combined-format log of about `size` bytes to `path`.
+    Client IPs are skewed (a few of `ips` addresses are much more frequent than others),
+    `miss_rate` share of lines is garbage not matched by the patterns. The same `seed` gives the same log.
+    """
+    rnd = random.Random(seed)
+    written = 0
+    with open(path, "w") as fh:
+        while written < size:
+            lines = []
+            for _ in range(1000):
+                if rnd.random() < miss_rate:
+                    lines.append("-- MARK --\n")
+                    continue
+                ip = int(rnd.paretovariate(1.2)) % ips
+                lines.append(
+                    f'10.{ip >> 16 & 255}.{ip >> 8 & 255}.{ip & 255} - - [17/May/2015:08:05:{rnd.randint(10, 59)} +0000] '
+                    f'"{rnd.choice(METHODS)} {rnd.choice(URLS)} HTTP/1.1" {rnd.choice(STATUSES)} {rnd.randint(0, 100_000)} '
+                    f'"-" "{rnd.choice(AGENTS)}"\n'
+                )
+            chunk = "".join(lines)
+            fh.write(chunk)
+            written += len(chunk)
+
+
+def text_status(path):
+    pattern = re.compile(STATUS_PATTERN.decode())
+    status_codes = []
+    bytes_served = 0
+    with open(path, "r") as logs:
+        for line in logs:
+            match = pattern.search(line)
+            if match:
+                status_codes.append(int(match.group("status_code")))
+                bytes_served += int(match.group("bytes"))
+    return bytes_served, sum(1 for status_code in status_codes if 400 <= status_code < 600)
+
+
+def mmap_status(path):
+    pattern = re.compile(STATUS_PATTERN)
+    status_codes = collections.Counter()
+    bytes_served = 0
+    with logscan.mapped(path) as buffer:
+        for results in logscan.findall(buffer, pattern, on_miss=lambda line: None):
+            status_codes.update(map(operator.itemgetter(0), results))
+            bytes_served += sum(map(int, map(operator.itemgetter(1), results)))
+    return bytes_served, sum(count for status_code, count in status_codes.items() if 400 <= int(status_code) < 600)
+
+
+def text_ips(path):
+    ips = {}
+    with open(path) as file:
+        for line in file:
+            for ip in re.findall("^" + IP_PATTERN.decode(), line):
+                ips[ip] = ips.get(ip, 0) + 1
+    return sorted(ips.values(), reverse=True)[:10]
+
+
+def mmap_ips(path):
+    ips = collections.Counter()
+    with logscan.mapped(path) as buffer:
+        for found_ips in logscan.findall(buffer, re.compile(IP_PATTERN), anchored=True):
+            ips.update(found_ips)
+    return sorted(ips.values(), reverse=True)[:10]
+
+
+def measure(function, path, trace):
+    if trace:
+        tracemalloc.start()
+    started = time.process_time()
+    result = function(path)
+    cpu_time = time.process_time() - started
+    peak = 0
+    if trace:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result, cpu_time, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare text mode and mmap/bytes regexp log parsing")
+    parser.add_argument("--size", default="100M", help="synthetic log size, K/M/G suffixes are supported")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--log", help="use existing log instead of generating one")
+    parser.add_argument("--tracemalloc", action="store_true", help="trace allocations peak (slows parsing down)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = args.log
+        if path is None:
+            path = os.path.join(tmp_dir, "access.log")
+            generate_log(path, parse_size(args.size), args.seed)
+        logging.info(f"Log {path}: {os.path.getsize(path) / 1024 ** 2:.1f} MiB")
+
+        for name, text_function, mmap_function in [
+            ("status codes (Task2)", text_status, mmap_status),
+            ("top IPs (8.log_parser.py)", text_ips, mmap_ips),
+        ]:
+            expected, text_time, text_peak = measure(text_function, path, args.tracemalloc)
+            actual, mmap_time, mmap_peak = measure(mmap_function, path, args.tracemalloc)
+            assert expected == actual, f"Results mismatch: {expected} != {actual}"
+            message = f"{name}: text {text_time:.2f}s CPU, mmap {mmap_time:.2f}s CPU, x{text_time / mmap_time:.1f} faster"
+            if args.tracemalloc:
+                message += f"; allocations peak text {text_peak / 1024 ** 2:.1f} MiB, mmap {mmap_peak / 1024 ** 2:.1f} MiB"
+            logging.info(message)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(
+        level=logging.DEBUG,
+        format='%(message)s',
+    )
+
+    main()
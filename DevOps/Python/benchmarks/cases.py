@@ -0,0 +1,200 @@
+import base64
+import csv
+import gzip
+import importlib.util
+import os
+import re
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HOMEWORK = os.path.join(ROOT, "Homework")
+WORKSHOP = os.path.join(ROOT, "Workshop", "msdp-python-workshop")
+# the same key for every run, so tokens and timings do not depend on a random key
+HSM_KEY = "0" * 32
+
+
+class Case(object):
+    """
+    Benchmark of a hot path measured for each of `sizes` (in `unit`) of the input. `setup(size, data, cleanup)`
+    prepares the input and returns the function to measure, it is called in a separate process with `paths`
+    added to `sys.path`, so modules of different Tasks with the same names do not clash.
+    """
+    def __init__(self, name, paths, sizes, unit, setup):
+        self.name = name
+        self.paths = paths
+        self.sizes = sizes
+        self.unit = unit
+        self.setup = setup
+
+
+CASES = {}
+
+
+def case(name, paths, sizes, unit):
+    def register(setup):
+        CASES[name] = Case(name, paths, sizes, unit, setup)
+        return setup
+    return register
+
+
+class Data(object):
+    """
+    Generated inputs shared by the cases of a run, the generators are deterministic, so a file generated once
+    is reused by other cases (and runs with the same `directory`).
+    """
+    def __init__(self, directory):
+        self.directory = directory
+
+    def path(self, name, generate):
+        path = os.path.join(self.directory, name)
+        if not os.path.exists(path):
+            os.makedirs(self.directory, exist_ok=True)
+            generate(path + ".tmp")
+            os.replace(path + ".tmp", path)
+        return path
+
+
+def access_log(data, size):
+    import benchmark_logscan
+    return data.path(f"access-{size}.log", lambda path: benchmark_logscan.generate_log(path, size))
+
+
+@case("task1.report", [os.path.join(WORKSHOP, "Task1")], [10_000, 100_000], "rows")
+def task1_report(size, data, cleanup):
+    import benchmark
+    import report
+    import stats
+
+    content = base64.b64encode(gzip.compress(benchmark.generate_report(size).encode(), mtime=0))
+
+    def run():
+        # chunks as `response.iter_content()` gives them
+        chunks = (content[start:start + report.CHUNK_SIZE] for start in range(0, len(content), report.CHUNK_SIZE))
+        return stats.summarize(stats.load_report(report.iter_lines(report.inflate(report.b64decode(chunks)))))
+    return run
+
+
+@case("task2.parse", [os.path.join(WORKSHOP, "Task2"), ROOT], [8 * 1024 ** 2, 64 * 1024 ** 2], "bytes")
+def task2_parse(size, data, cleanup):
+    import access_log as task2_access_log
+    import benchmark_logscan
+
+    path = access_log(data, size)
+    pattern = re.compile(benchmark_logscan.STATUS_PATTERN)
+    # a single process, the result should not depend on CPU count of the machine
+    return lambda: task2_access_log.parse(path, pattern, workers=1)
+
+
+@case("task3.plan", [os.path.join(WORKSHOP, "Task3")], [10_000, 100_000], "names")
+def task3_plan(size, data, cleanup):
+    import benchmark
+    import retention
+
+    names = benchmark.generate_names(size)
+    return lambda: retention.plan(names, monthly=12, weekly=8, daily=30)
+
+
+def employees_csv(data, size):
+    import benchmark
+    return data.path(f"employees-{size}.csv", lambda path: benchmark.generate_csv(path, size))
+
+
+@case("task4.load", [os.path.join(WORKSHOP, "Task4")], [10_000, 100_000], "rows")
+def task4_load(size, data, cleanup):
+    import benchmark
+    import loader
+
+    csv_path = employees_csv(data, size)
+    database = os.path.join(data.directory, f"task4-load-{os.getpid()}.sqlite")
+    cleanup.callback(lambda: os.path.exists(database) and os.remove(database))
+
+    def run():
+        connection = benchmark.create_database(database)
+        try:
+            with open(csv_path, newline="") as fh:
+                return loader.load(connection, "employees", csv.DictReader(fh))
+        finally:
+            connection.close()
+    return run
+
+
+@case("task4.dump", [os.path.join(WORKSHOP, "Task4")], [10_000, 100_000], "rows")
+def task4_dump(size, data, cleanup):
+    import benchmark
+    import dump
+    import loader
+
+    def create(path):
+        connection = benchmark.create_database(path)
+        try:
+            with open(employees_csv(data, size), newline="") as fh:
+                loader.load(connection, "employees", csv.DictReader(fh))
+        finally:
+            connection.close()
+
+    database = data.path(f"employees-{size}.sqlite", create)
+
+    def run():
+        with open(os.devnull, "wb") as fh:
+            return dump.dump(database, fh, threads=1)
+    return run
+
+
+@case("task5.sample", [os.path.join(WORKSHOP, "Task5")], [100, 1000], "processes")
+def task5_sample(size, data, cleanup):
+    import benchmark
+    import sampler
+
+    cleanup.callback(benchmark.stop, benchmark.spawn(size, matching_every=50))
+    process_sampler = sampler.ProcessSampler()
+    # the first scrape reads names of all the processes, steady state scrapes are measured
+    process_sampler.sample()
+    return process_sampler.sample
+
+
+@case("task6.encrypt", [os.path.join(WORKSHOP, "Task6")], [1000, 10_000], "texts")
+def task6_encrypt(size, data, cleanup):
+    from hsm import HSM
+
+    hsm = HSM(HSM_KEY, latency=(0, 0))
+    texts = [f"token-{index}" for index in range(size)]
+    return lambda: [hsm.encrypt(text) for text in texts]
+
+
+def zeros(path, size):
+    # the content does not matter for AES-GCM speed
+    with open(path, "wb") as fh:
+        fh.truncate(size)
+
+
+@case("task6.encrypt_stream", [os.path.join(WORKSHOP, "Task6")], [16 * 1024 ** 2, 128 * 1024 ** 2], "bytes")
+def task6_encrypt_stream(size, data, cleanup):
+    from hsm import HSM
+
+    hsm = HSM(HSM_KEY, latency=(0, 0))
+    path = data.path(f"zeros-{size}.bin", lambda path: zeros(path, size))
+
+    def run():
+        with open(path, "rb") as src, open(os.devnull, "wb") as dst:
+            hsm.encrypt_stream(src, dst)
+    return run
+
+
+def log_parser():
+    # the module name starts with a digit, it can not be imported with `import`
+    spec = importlib.util.spec_from_file_location("log_parser", os.path.join(HOMEWORK, "8.log_parser.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def homework8_topk(mode):
+    def setup(size, data, cleanup):
+        parser = log_parser()
+        path = access_log(data, size)
+        return lambda: parser.count_file(path, mode, capacity=10_000).top(10)
+    return setup
+
+
+for mode in ("exact", "approx"):
+    case(f"homework8.topk_{mode}", [HOMEWORK, ROOT], [8 * 1024 ** 2, 64 * 1024 ** 2], "bytes")(homework8_topk(mode))
@@ -0,0 +1,76 @@
+import resource
+import statistics
+import sys
+import time
+import tracemalloc
+
+
+def rss(field="VmRSS"):
+    """
+    Return `field` memory size of the current process from /proc in bytes, None where it is not available.
+    """
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def reset_peak_rss():
+    """
+    Reset peak RSS of the process (Linux only), so inputs prepared before the measurement are not counted.
+    Return False if it is not supported.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as clear_refs:
+            clear_refs.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss():
+    peak = rss("VmHWM")
+    if peak is None:
+        # kilobytes on Linux, bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        peak *= 1 if sys.platform == "darwin" else 1024
+    return peak
+
+
+def measure(function, repeat):
+    """
+    Call `function()` once to warm up, then `repeat` times measuring wall time and peak RSS,
+    then once more under `tracemalloc` (it slows calls down, so it is not timed).
+    """
+    function()
+    peak_reset = reset_peak_rss()
+    rss_before = rss() or 0
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - started)
+    peak = peak_rss()
+
+    tracemalloc.start()
+    try:
+        function()
+        alloc_retained, alloc_peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "times": times,
+        "min": min(times),
+        "median": statistics.median(times),
+        "peak_rss": peak,
+        # since the process start if the peak can not be reset
+        "peak_rss_reset": peak_reset,
+        "peak_rss_growth": max(peak - rss_before, 0) if peak_reset else None,
+        "alloc_peak": alloc_peak,
+        "alloc_retained": alloc_retained,
+    }
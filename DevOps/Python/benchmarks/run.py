@@ -0,0 +1,200 @@
+import argparse
+import contextlib
+import fnmatch
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import cases
+import measure
+
+
+REPEAT = 5
+# relative slowdown (or memory growth) against the baseline reported as a regression
+THRESHOLD = 0.1
+MEMORY_THRESHOLD = 0.2
+# measurements compared with the baseline: (result field, threshold argument)
+COMPARED = [("median", "threshold"), ("peak_rss", "memory_threshold"), ("alloc_peak", "memory_threshold")]
+
+
+def result_key(name, size):
+    return f"{name}[{size}]"
+
+
+def run_case(args):
+    """
+    Measure a single case in this process, print the result as JSON.
+    """
+    case = cases.CASES[args.name]
+    sys.path[:0] = case.paths
+    with contextlib.ExitStack() as cleanup:
+        function = case.setup(args.size, cases.Data(args.data_dir), cleanup)
+        result = measure.measure(function, args.repeat)
+    result["throughput"] = args.size / result["median"] if result["median"] else None
+    print(json.dumps(result))
+
+
+def spawn_case(name, size, repeat, data_dir):
+    process = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "case", name, str(size), "--repeat", str(repeat), "--data-dir", data_dir],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True,
+    )
+    if process.returncode != 0:
+        return {"error": process.stderr.strip().splitlines()[-1] if process.stderr.strip() else f"exit code {process.returncode}"}
+    return json.loads(process.stdout.strip().splitlines()[-1])
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=cases.ROOT,
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, universal_newlines=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def mib(value):
+    return f"{value / 1024 ** 2:.1f} MiB" if value is not None else "-"
+
+
+def describe(name, size, result):
+    if "error" in result:
+        return f"{result_key(name, size)}: failed, {result['error']}"
+    unit = cases.CASES[name].unit if name in cases.CASES else "items"
+    return (
+        f"{result_key(name, size)}: median {result['median'] * 1000:.1f}ms (min {result['min'] * 1000:.1f}ms), "
+        f"{result['throughput']:,.0f} {unit}/s, peak RSS {mib(result['peak_rss'])} "
+        f"(+{mib(result['peak_rss_growth'])}), allocations peak {mib(result['alloc_peak'])}"
+    )
+
+
+def compare(results, baseline, threshold=THRESHOLD, memory_threshold=MEMORY_THRESHOLD):
+    """
+    Return regression messages of `results` against `baseline` results (both as saved by `run`),
+    cases missing in either of them are skipped.
+    """
+    thresholds = {"threshold": threshold, "memory_threshold": memory_threshold}
+    regressions = []
+    for key, result in sorted(results["results"].items()):
+        expected = baseline["results"].get(key)
+        if expected is None or "error" in expected:
+            continue
+        if "error" in result:
+            regressions.append(f"{key}: failed, {result['error']}")
+            continue
+        for field, threshold_name in COMPARED:
+            if not expected.get(field) or result.get(field) is None:
+                continue
+            change = result[field] / expected[field] - 1
+            logging.debug(f"{key} {field}: {change:+.1%}")
+            if change > thresholds[threshold_name]:
+                regressions.append(f"{key}: {field} {expected[field]:.4g} -> {result[field]:.4g} ({change:+.1%})")
+    return regressions
+
+
+def report_regressions(results, args):
+    with open(args.baseline) as fh:
+        baseline = json.load(fh)
+    if baseline.get("machine") != results.get("machine"):
+        logging.warning(f"Baseline was measured on another machine: {baseline.get('machine')}")
+    regressions = compare(results, baseline, args.threshold, args.memory_threshold)
+    for regression in regressions:
+        logging.error(f"REGRESSION {regression}")
+    if not regressions:
+        logging.info(f"No regressions against {args.baseline}")
+    return 1 if regressions else 0
+
+
+def run(args):
+    names = [name for name in cases.CASES if any(fnmatch.fnmatch(name, pattern) for pattern in args.cases)]
+    if not names:
+        raise SystemExit(f"No cases match {args.cases}, available: {', '.join(cases.CASES)}")
+
+    results = {
+        "machine": {"platform": platform.platform(), "python": platform.python_version(), "cpus": os.cpu_count()},
+        "commit": git_commit(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "repeat": args.repeat,
+        "results": {},
+    }
+    with contextlib.ExitStack() as stack:
+        data_dir = args.data_dir or stack.enter_context(tempfile.TemporaryDirectory(prefix="benchmarks-"))
+        for name in names:
+            sizes = cases.CASES[name].sizes[:1] if args.quick else cases.CASES[name].sizes
+            for size in sizes:
+                result = spawn_case(name, size, args.repeat, data_dir)
+                results["results"][result_key(name, size)] = result
+                logging.info(describe(name, size, result))
+
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump(results, fh, indent=2, sort_keys=True)
+        logging.info(f"Results saved to {args.output}")
+    exit_code = 1 if any("error" in result for result in results["results"].values()) else 0
+    if args.baseline:
+        exit_code = report_regressions(results, args) or exit_code
+    return exit_code
+
+
+def compare_files(args):
+    with open(args.results) as fh:
+        results = json.load(fh)
+    return report_regressions(results, args)
+
+
+def add_threshold_arguments(parser):
+    parser.add_argument("--threshold", type=float, default=THRESHOLD, help="relative slowdown of median time")
+    parser.add_argument(
+        "--memory-threshold", type=float, default=MEMORY_THRESHOLD, help="relative growth of peak RSS and allocations"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks of the workshop Tasks and homework hot paths")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="measure the cases, optionally compare with a baseline")
+    run_parser.add_argument("cases", nargs="*", default=["*"], help="case names or glob patterns, all by default")
+    run_parser.add_argument("--repeat", type=int, default=REPEAT, help="timed calls per case and size")
+    run_parser.add_argument("--quick", action="store_true", help="the smallest size of each case only")
+    run_parser.add_argument("--data-dir", help="keep generated inputs there between runs (a temporary one by default)")
+    run_parser.add_argument("--output", help="save results to this JSON file, it can be used as a baseline later")
+    run_parser.add_argument("--baseline", help="results JSON to compare with, exit code is 1 on regressions")
+    add_threshold_arguments(run_parser)
+    run_parser.set_defaults(func=run)
+
+    compare_parser = subparsers.add_parser("compare", help="compare saved results with a baseline")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("results")
+    add_threshold_arguments(compare_parser)
+    compare_parser.set_defaults(func=compare_files)
+
+    list_parser = subparsers.add_parser("list", help="list the cases and their sizes")
+    list_parser.set_defaults(func=lambda args: print(
+        "\n".join(f"{case.name}: {', '.join(map(str, case.sizes))} {case.unit}" for case in cases.CASES.values())
+    ))
+
+    case_parser = subparsers.add_parser("case", help="measure a single case in this process (used by run)")
+    case_parser.add_argument("name", choices=sorted(cases.CASES))
+    case_parser.add_argument("size", type=int)
+    case_parser.add_argument("--repeat", type=int, default=REPEAT)
+    case_parser.add_argument("--data-dir", required=True)
+    case_parser.set_defaults(func=run_case)
+
+    args = parser.parse_args()
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        format='%(message)s',
+    )
+    sys.exit(args.func(args))
+
+
+if __name__ == '__main__':
+    main()
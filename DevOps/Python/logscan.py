@@ -0,0 +1,299 @@
+import bz2
+import contextlib
+import glob
+import gzip
+import json
+import logging
+import lzma
+import mmap
+import os
+import re
+import time
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+# newline-aligned windows `findall()` works on, it bounds the memory taken by match results
+WINDOW_SIZE = 256 * 1024
+# bytes from the log start fingerprinted in checkpoints, they tell a new log reusing the inode of a rotated one
+HEAD_SIZE = 4096
+# seconds between `follow()` steps
+FOLLOW_INTERVAL = 2.0
+# decompressed data is scanned in blocks of about that size
+BLOCK_SIZE = 4 * 1024 * 1024
+
+# compressed logs are detected by the magic bytes they start with, not by the file name
+MAGICS = [
+    (b"\x1f\x8b", "gzip"),
+    (b"BZh", "bz2"),
+    (b"\xfd7zXZ\x00", "xz"),
+    (b"\x28\xb5\x2f\xfd", "zstd"),
+]
+
+
+@contextlib.contextmanager
+def mapped(path):
+    """
+    Memory-map `path` file read-only. Empty file (it can not be mapped) gives empty bytes.
+    """
+    with open(path, "rb") as fh:
+        try:
+            buffer = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            yield b""
+            return
+        with buffer:
+            yield buffer
+
+
+def log_miss(line):
+    logging.warning(f"Not matched: {line.decode(errors='replace').rstrip()}")
+
+
+def windows(buffer, start=0, end=None, size=WINDOW_SIZE):
+    """
+    Split [start, end) range of `buffer` into (window_start, window_end) ranges of about `size` bytes,
+    each range ends right after a newline (or at `end`).
+    """
+    end = len(buffer) if end is None else end
+    while start < end:
+        window_end = buffer.find(b"\n", min(start + size, end) - 1, end) + 1 or end
+        yield start, window_end
+        start = window_end
+
+
+class LinePatterns(object):
+    """
+    Regexps derived from `pattern`. The newline each line starts with is used as a literal prefix,
+    it lets regexp engine jump from line to line with a fast search instead of trying every position.
+    Windows are searched starting from the newline right before them, the very first line of
+    the buffer has no newline before it, so it is matched separately.
+    """
+    def __init__(self, pattern, anchored):
+        self.pattern = pattern
+        self.anchored = anchored
+        source, flags = pattern.pattern, pattern.flags
+        # anchored search keeps `pattern` groups (or captures the whole match, if it has no groups)
+        self.search = re.compile(b"\n(" + source + b")" if pattern.groups == 0 else b"\n(?:" + source + b")", flags)
+        # line which `pattern` can not be found in, the last group captures that line
+        prefix = b"" if anchored else b"[^\n]*?"
+        self.miss = re.compile(b"\n(?!" + prefix + b"(?:" + source + b"))([^\n]*)", flags)
+
+    def first_line(self, buffer, end):
+        """
+        Return `pattern` match (or None) for the first line of `buffer` and the end of that line.
+        """
+        line_end = buffer.find(b"\n", 0, end)
+        line_end = end if line_end == -1 else line_end
+        if self.anchored:
+            return self.pattern.match(buffer, 0, line_end), line_end
+        return self.pattern.search(buffer, 0, line_end), line_end
+
+
+def _search_range(buffer, window_start, window_end):
+    # newline before the window starts its first line, newline at its end belongs to the next window
+    search_end = window_end - 1 if buffer[window_end - 1:window_end] == b"\n" else window_end
+    return max(window_start - 1, 0), search_end
+
+
+def _lines_count(buffer, start, end):
+    window = buffer[start:end]
+    return window.count(b"\n") + (not window.endswith(b"\n"))
+
+
+def _findall_result(match):
+    if match.re.groups == 0:
+        return match.group()
+    if match.re.groups == 1:
+        return match.group(1)
+    return match.groups()
+
+
+def _misses(buffer, patterns, window_start, window_end, on_miss):
+    if window_start == 0:
+        match, line_end = patterns.first_line(buffer, window_end)
+        if match is None:
+            on_miss(buffer[0:line_end])
+    for match in patterns.miss.finditer(buffer, *_search_range(buffer, window_start, window_end)):
+        on_miss(match.group(patterns.miss.groups))
+
+
+def findall(buffer, pattern, start=0, end=None, on_miss=None, anchored=False, window_size=WINDOW_SIZE):
+    """
+    Yield list of `pattern.findall()` results for each newline-aligned window of [start, end) range
+    of `buffer` (`bytes` or `mmap` object), so lines are matched by the regexp engine without splitting
+    the content into line objects and without a Python-level step per line. `start` must point to a line start.
+
+    `pattern` is a compiled bytes regexp, it must not match newlines and has to match at most once per line:
+    either it is `anchored` to the line start (it must not contain `^` itself, the anchor is handled here),
+    or its greedy tail consumes the rest of the line. So results are the same as from `re.search()`
+    (or `re.match()` for `anchored` pattern) called line by line.
+
+    When `on_miss` callback is given, windows where number of results differs from number of lines
+    are searched for not matched lines, only these lines are materialized and passed to the callback
+    (use `log_miss` to log them).
+    """
+    end = len(buffer) if end is None else end
+    patterns = LinePatterns(pattern, anchored)
+
+    for window_start, window_end in windows(buffer, start, end, window_size):
+        if anchored:
+            results = []
+            if window_start == 0:
+                match, _ = patterns.first_line(buffer, window_end)
+                if match:
+                    results.append(_findall_result(match))
+            results += patterns.search.findall(buffer, *_search_range(buffer, window_start, window_end))
+        else:
+            results = pattern.findall(buffer, window_start, window_end)
+
+        if on_miss is not None and len(results) != _lines_count(buffer, window_start, window_end):
+            _misses(buffer, patterns, window_start, window_end, on_miss)
+        yield results
+
+
+def findall_stream(stream, pattern, on_miss=None, anchored=False, block_size=BLOCK_SIZE):
+    """
+    Same as `findall()`, but for binary `stream` (e.g. decompressed file) read in newline-aligned blocks
+    of about `block_size` bytes, so memory use does not depend on the stream size.
+    """
+    tail = b""
+    while True:
+        data = stream.read(block_size)
+        block = tail + data if tail else data
+        # the last line of the stream may have no newline
+        end = block.rfind(b"\n") + 1 if data else len(block)
+        if end:
+            yield from findall(block, pattern, 0, end, on_miss, anchored)
+        if not data:
+            return
+        tail = block[end:]
+
+
+def codec(path):
+    """
+    Return compression codec name of `path` file (see `MAGICS`) or None for a plain file.
+    """
+    with open(path, "rb") as fh:
+        head = fh.read(max(len(magic) for magic, _ in MAGICS))
+    for magic, name in MAGICS:
+        if head.startswith(magic):
+            return name
+    return None
+
+
+def open_compressed(path, codec_name):
+    """
+    Open `path` file compressed with `codec_name` codec as binary stream of decompressed data.
+    """
+    if codec_name == "gzip":
+        return gzip.open(path, "rb")
+    if codec_name == "bz2":
+        return bz2.open(path, "rb")
+    if codec_name == "xz":
+        return lzma.open(path, "rb")
+    if zstandard is None:
+        raise RuntimeError(f"{path} is zstd compressed, install zstandard package to read it")
+    return zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), read_across_frames=True, closefd=True)
+
+
+def findall_file(path, pattern, on_miss=None, anchored=False):
+    """
+    Same as `findall()` for the whole `path` log: plain file is memory-mapped,
+    compressed one is decompressed on the fly and scanned as a stream.
+    """
+    codec_name = codec(path)
+    if codec_name is None:
+        with mapped(path) as buffer:
+            yield from findall(buffer, pattern, on_miss=on_miss, anchored=anchored)
+        return
+    with open_compressed(path, codec_name) as stream:
+        yield from findall_stream(stream, pattern, on_miss, anchored)
+
+
+def expand(paths):
+    """
+    Expand glob patterns in `paths`. Pattern which matches nothing is kept as is, so opening it fails as usual.
+    """
+    expanded = []
+    for path in paths:
+        expanded += sorted(glob.glob(path)) or [path]
+    return list(dict.fromkeys(expanded))
+
+
+def complete_end(buffer, start=0):
+    """
+    Return the end of the last complete (newline terminated) line of `buffer` after `start`,
+    or `start` if there is no complete line. A line being written right now is left for the next run.
+    """
+    return buffer.rfind(b"\n", start) + 1 or start
+
+
+def _head(log_path, size):
+    with open(log_path, "rb") as fh:
+        return zlib.crc32(fh.read(size))
+
+
+class Checkpoint(object):
+    """
+    Position of incrementally parsed log and serialized aggregates of everything before it.
+    It is kept in `path` JSON file (if `path` is given), so the next run parses only lines appended since then.
+    """
+    def __init__(self, path=None):
+        self.path = path
+        self.inode = None
+        self.head = None
+        self.offset = 0
+        self.state = None
+        if path is not None and os.path.exists(path):
+            with open(path) as fh:
+                saved = json.load(fh)
+            self.inode, self.head, self.offset, self.state = saved["inode"], saved["head"], saved["offset"], saved["state"]
+
+    def resume(self, log_path):
+        """
+        Return offset to resume `log_path` parsing from. If the log was rotated (it has another inode
+        or another head) or truncated, the checkpoint is reset and 0 is returned, so the log is parsed from the start.
+        Offset 0 always means there is nothing to resume, aggregates have to start from scratch.
+        """
+        if self.inode is None:
+            return self.offset
+        stat = os.stat(log_path)
+        if (
+            stat.st_ino != self.inode or stat.st_size < self.offset or
+            _head(log_path, min(self.offset, HEAD_SIZE)) != self.head
+        ):
+            logging.warning(f"{log_path} was rotated or truncated, parsing it from the start")
+            self.inode, self.head, self.offset, self.state = None, None, 0, None
+        return self.offset
+
+    def update(self, log_path, offset, state):
+        """
+        Remember `log_path` is parsed up to `offset` and `state` aggregates of it, save them to `path` file.
+        """
+        self.inode = os.stat(log_path).st_ino
+        self.head = _head(log_path, min(offset, HEAD_SIZE))
+        self.offset = offset
+        self.state = state
+        if self.path is None:
+            return
+        # written next to the checkpoint and renamed, so a crash never leaves a broken checkpoint
+        with open(self.path + ".tmp", "w") as fh:
+            json.dump({"inode": self.inode, "head": self.head, "offset": offset, "state": state}, fh)
+        os.replace(self.path + ".tmp", self.path)
+
+
+def follow(step, interval=FOLLOW_INTERVAL):
+    """
+    Call `step()` every `interval` seconds, until interrupted with Ctrl+C.
+    """
+    try:
+        while True:
+            step()
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        pass